@@ -0,0 +1,28 @@
+"""Кодирование ответов API в JSON.
+
+Если установлен orjson, используется он: он в разы быстрее json
+и сам умеет datetime. Без него — стандартный json с тем же форматом
+дат (ISO 8601 с микросекундами и смещением).
+"""
+import json
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def dumps(data):
+    """Компактный JSON в байтах."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(
+        data, default=_default, ensure_ascii=False, separators=(',', ':')
+    ).encode()
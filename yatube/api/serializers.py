@@ -0,0 +1,63 @@
+"""Поля ответов API: имя в JSON → поле для values().
+
+Ответы собираются прямо из строк values(), без экземпляров моделей.
+Клиент может запросить только нужные поля: ?fields=id,text,author.
+"""
+from django.core.files.storage import default_storage
+
+FEED_FIELDS = {
+    'id': 'id',
+    'pub_date': 'pub_date',
+    # В лентах — начало текста, как на HTML-страницах.
+    'text': 'preview',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'comments_count': 'comments_count',
+}
+POST_FIELDS = {**FEED_FIELDS, 'text': 'text'}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+CONVERTERS = {
+    'image': image_url,
+}
+
+
+def select_fields(request, fields):
+    """Имена запрошенных полей; ValueError, если такого поля нет."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(fields)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ValueError('Неизвестные поля: ' + ', '.join(unknown))
+    return names
+
+
+def lookups(names, fields, required=()):
+    """Аргументы для values(): выбранные поля и нужные паджинатору."""
+    return list(dict.fromkeys(
+        [fields[name] for name in names] + list(required)))
+
+
+def serialize(row, names, fields):
+    item = {}
+    for name in names:
+        value = row[fields[name]]
+        converter = CONVERTERS.get(name)
+        item[name] = converter(value) if converter else value
+    return item
@@ -0,0 +1,139 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from posts.tests.utils import run_on_commit
+
+from . import encoding
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_WORKERS=0, SQL_BUDGET_RAISE=True)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='title', slug='slug', description='description')
+        cls.posts = [
+            Post.objects.create(
+                text=f'text {number}', author=cls.author, group=cls.group)
+            for number in range(25)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'comment {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name, kwargs=None, **params):
+        response = self.client.get(
+            reverse(f'api:v1:{name}', kwargs=kwargs), params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, json.loads(response.content)
+
+    def test_feeds_are_paginated_by_cursor(self):
+        """Ленты отдаются страницами по курсору, новые посты первыми"""
+        expected = [post.pk for post in reversed(self.posts)]
+        for name, kwargs in (
+            ('posts', None),
+            ('group_posts', {'slug': 'slug'}),
+            ('author_posts', {'username': 'author'}),
+        ):
+            with self.subTest(name=name):
+                response, data = self.get(name, kwargs)
+                self.assertEqual(response.status_code, 200)
+                ids = [item['id'] for item in data['results']]
+                self.assertEqual(ids, expected[:20])
+                self.assertIsNone(data['previous'])
+                _, data = self.get(name, kwargs, cursor=data['next'])
+                ids = [item['id'] for item in data['results']]
+                self.assertEqual(ids, expected[20:])
+                self.assertIsNone(data['next'])
+
+    def test_field_selection(self):
+        """?fields оставляет в ответе только запрошенные поля"""
+        _, data = self.get('posts', fields='id,author', limit=2)
+        self.assertEqual(data['results'][0], {
+            'id': self.post.pk, 'author': 'author'})
+        self.assertEqual(len(data['results']), 2)
+        response, data = self.get('posts', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['error'])
+
+    def test_bad_parameters(self):
+        """Неверные курсор и limit дают 400 без ETag"""
+        for params in (
+            {'cursor': 'мусор'}, {'cursor': 'bm90IGpzb24'},
+            {'limit': 'много'}, {'limit': 0},
+        ):
+            with self.subTest(params=params):
+                response, data = self.get('posts', **params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', data)
+                self.assertFalse(response.has_header('ETag'))
+        _, data = self.get('posts', limit=1000)
+        self.assertEqual(len(data['results']), len(self.posts))
+
+    def test_post_and_comments(self):
+        """Пост отдаётся с полным текстом, комментарии — по порядку"""
+        _, data = self.get('post_detail', {'post_id': self.post.pk})
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['group'], 'slug')
+        self.assertIsNone(data['image'])
+        self.assertEqual(data['comments_count'], 3)
+        _, data = self.get('post_comments', {'post_id': self.post.pk})
+        self.assertEqual(
+            [item['text'] for item in data['results']],
+            ['comment 0', 'comment 1', 'comment 2'])
+        response, _ = self.get('post_detail', {'post_id': 0})
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get(self):
+        """Повторный запрос с ETag получает 304, новый пост меняет ETag"""
+        url = reverse('api:v1:posts')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(
+            self.client.get(url, {'fields': 'id'})['ETag'], etag)
+        Post.objects.create(text='new', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_feed_etags(self):
+        """Новый комментарий меняет ETag лент: в них есть comments_count"""
+        urls = (
+            reverse('api:v1:posts'),
+            reverse('api:v1:group_posts', kwargs={'slug': 'slug'}),
+            reverse('api:v1:author_posts', kwargs={'username': 'author'}),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        with run_on_commit():
+            Comment.objects.create(
+                post=self.post, author=self.author, text='new comment')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                data = json.loads(response.content)
+                self.assertEqual(data['results'][0]['comments_count'], 4)
+
+    def test_dates_are_iso_8601(self):
+        """Даты кодируются в ISO 8601 со смещением, с orjson и без"""
+        self.assertIsNotNone(encoding.orjson)
+        data = {'date': self.post.pub_date, 'text': 'текст'}
+        expected = {'date': self.post.pub_date.isoformat(), 'text': 'текст'}
+        self.assertEqual(json.loads(encoding.dumps(data)), expected)
+        with mock.patch.object(encoding, 'orjson', None):
+            self.assertEqual(json.loads(encoding.dumps(data)), expected)
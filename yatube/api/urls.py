@@ -0,0 +1,25 @@
+from django.urls import include, path
+
+from . import views
+
+app_name = 'api'
+
+v1 = [
+    path('posts/', views.posts, name='posts'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path(
+        'authors/<str:username>/posts/',
+        views.author_posts,
+        name='author_posts'
+    ),
+]
+
+urlpatterns = [
+    path('v1/', include((v1, 'v1'))),
+]
@@ -0,0 +1,140 @@
+"""JSON API лент, постов и комментариев, версия 1.
+
+Ответы — строки values(), закодированные api.encoding.dumps; ETag
+тот же, что у HTML-страниц (posts.conditional), так что
+повторный запрос с If-None-Match стоит пары запросов к базе и кэшу.
+"""
+from functools import wraps
+
+from django.http import HttpResponse
+from django.views.decorators.http import condition, require_safe
+
+from core.paginator import CursorPaginator
+from posts import conditional
+from posts.models import Comment, Group, Post, User
+
+from . import serializers
+from .encoding import dumps
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('created', 'id')
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        dumps(data), status=status, content_type='application/json')
+
+
+def error(status, message):
+    return json_response({'error': message}, status=status)
+
+
+def api_condition(etag_func):
+    """condition() без ETag у ответов с ошибкой.
+
+    ETag считается до вьюхи по адресу запроса; клиент не должен
+    кэшировать под ним 400 и потом получать на него 304.
+    """
+    def decorator(view):
+        view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code >= 400:
+                del response['ETag']
+            return response
+        return wrapper
+    return decorator
+
+
+def page_size(request):
+    """?limit, не больше MAX_PAGE_SIZE; ValueError, если это не число > 0."""
+    size = int(request.GET.get('limit', PAGE_SIZE))
+    if size < 1:
+        raise ValueError(size)
+    return min(size, MAX_PAGE_SIZE)
+
+
+def page_response(request, queryset, fields, ordering):
+    """Страница строк queryset с курсорами соседних страниц."""
+    try:
+        names = serializers.select_fields(request, fields)
+    except ValueError as exc:
+        return error(400, str(exc))
+    try:
+        size = page_size(request)
+    except ValueError:
+        return error(400, 'limit — целое число больше нуля.')
+    key = tuple(field.lstrip('-') for field in ordering)
+    rows = queryset.values(*serializers.lookups(names, fields, key))
+    paginator = CursorPaginator(rows, size, ordering=ordering)
+    cursor = request.GET.get('cursor')
+    if cursor and paginator.decode_cursor(cursor) is None:
+        return error(400, 'Неверный курсор.')
+    page = paginator.get_page(cursor)
+    return json_response({
+        'results': [
+            serializers.serialize(row, names, fields) for row in page
+        ],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@require_safe
+@api_condition(conditional.index_etag)
+def posts(request):
+    return page_response(
+        request, Post.objects.all(), serializers.FEED_FIELDS, POST_ORDERING)
+
+
+@require_safe
+@api_condition(conditional.group_etag)
+def group_posts(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    if group_id is None:
+        return error(404, 'Группа не найдена.')
+    return page_response(
+        request, Post.objects.filter(group_id=group_id),
+        serializers.FEED_FIELDS, POST_ORDERING)
+
+
+@require_safe
+@api_condition(conditional.profile_etag)
+def author_posts(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return error(404, 'Автор не найден.')
+    return page_response(
+        request, Post.objects.filter(author_id=author_id),
+        serializers.FEED_FIELDS, POST_ORDERING)
+
+
+@require_safe
+@api_condition(conditional.post_etag)
+def post_detail(request, post_id):
+    fields = serializers.POST_FIELDS
+    try:
+        names = serializers.select_fields(request, fields)
+    except ValueError as exc:
+        return error(400, str(exc))
+    row = Post.objects.filter(pk=post_id).values(
+        *serializers.lookups(names, fields)).first()
+    if row is None:
+        return error(404, 'Пост не найден.')
+    return json_response(serializers.serialize(row, names, fields))
+
+
+@require_safe
+@api_condition(conditional.post_etag)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error(404, 'Пост не найден.')
+    return page_response(
+        request, Comment.objects.filter(post_id=post_id),
+        serializers.COMMENT_FIELDS, COMMENT_ORDERING)
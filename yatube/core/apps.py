@@ -1,5 +1,18 @@
+import warnings
+
 from django.apps import AppConfig
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from PIL import Image
+
+        # Выше MAX_IMAGE_PIXELS Pillow только предупреждает, а ошибку
+        # бросает лишь с удвоенного предела. Предупреждение тоже делаем
+        # ошибкой: и форма, и воркеры (django.setup в пуле снова вызывает
+        # ready) отказываются от картинки уже с IMAGE_MAX_PIXELS.
+        Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
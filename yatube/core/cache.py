@@ -0,0 +1,256 @@
+"""Кэш в локальном файле SQLite, общий для всех процессов одного хоста.
+
+LocMemCache у каждого воркера свой, поэтому фрагменты и метаданные
+миниатюр считаются заново в каждом процессе. Этот бэкенд держит данные
+в одном файле SQLite в режиме WAL: читатели не блокируют писателя, а
+страницы файла отображаются в память (mmap), так что попадание в кэш —
+это чтение из page cache ОС без системных вызовов на каждый блок.
+
+Размер ограничен опцией MAX_SIZE (байты): при переполнении удаляются
+сначала просроченные, затем давно не читанные записи (приближённый
+LRU с точностью ACCESS_RESOLUTION секунд). add() и incr() атомарны
+между процессами благодаря BEGIN IMMEDIATE.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_size ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' total INTEGER NOT NULL'
+    ')',
+    'INSERT OR IGNORE INTO cache_size (id, total) VALUES (0, 0)',
+)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._mmap_size = int(options.get('MMAP_SIZE', self._max_size * 2))
+        self._access_resolution = float(options.get('ACCESS_RESOLUTION', 60))
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение своё у каждого потока и переоткрывается после fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f'PRAGMA mmap_size={self._mmap_size}')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _write(self):
+        return _Transaction(self._connection())
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _store(self, connection, key, value, timeout, now):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        row = connection.execute(
+            'SELECT size FROM cache WHERE key = ?', (key,)).fetchone()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache'
+            ' (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+            (key, data, self._expires(timeout), now, len(data)),
+        )
+        self._resize(connection, len(data) - (row[0] if row else 0), now)
+
+    def _resize(self, connection, delta, now):
+        connection.execute(
+            'UPDATE cache_size SET total = total + ? WHERE id = 0', (delta,))
+        total = connection.execute(
+            'SELECT total FROM cache_size WHERE id = 0').fetchone()[0]
+        if total > self._max_size:
+            self._cull(connection, total, now)
+
+    def _cull(self, connection, total, now):
+        freed = connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM cache WHERE expires <= ?',
+            (now,)).fetchone()[0]
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        total -= freed
+        # Освобождаем с запасом в четверть лимита, чтобы не чистить
+        # кэш на каждой следующей записи.
+        target = self._max_size * 3 // 4
+        while total > target:
+            rows = connection.execute(
+                'SELECT key, size FROM cache ORDER BY accessed LIMIT 100'
+            ).fetchall()
+            if not rows:
+                break
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key, _ in rows])
+            total -= sum(size for _, size in rows)
+        connection.execute(
+            'UPDATE cache_size SET total = ? WHERE id = 0', (max(total, 0),))
+
+    def _touch_accessed(self, connection, keys, now):
+        connection.execute(
+            'UPDATE cache SET accessed = ? WHERE accessed < ? AND key IN (%s)'
+            % ', '.join('?' * len(keys)),
+            (now, now - self._access_resolution, *keys),
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT key, value, accessed FROM cache'
+            ' WHERE key IN (%s) AND (expires IS NULL OR expires > ?)'
+            % ', '.join('?' * len(keys)),
+            (*keys, now),
+        ).fetchall()
+        stale = [
+            key for key, _, accessed in rows
+            if accessed < now - self._access_resolution
+        ]
+        if stale:
+            self._touch_accessed(connection, stale, now)
+        return {key: pickle.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            self._store(connection, key, value, timeout, time.time())
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._write() as connection:
+            for key, value in data.items():
+                self._store(
+                    connection, self._key(key, version), value, timeout, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT 1 FROM cache'
+                ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, now)).fetchone()
+            if row:
+                return False
+            self._store(connection, key, value, timeout, now)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, size FROM cache'
+                ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, now)).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ?, accessed = ?'
+                ' WHERE key = ?',
+                (data, len(data), now, key))
+            self._resize(connection, len(data) - row[1], now)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ?'
+                ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self._expires(timeout), now, key, now))
+            return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache'
+            ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if not keys:
+            return
+        placeholders = ', '.join('?' * len(keys))
+        with self._write() as connection:
+            freed = connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM cache'
+                ' WHERE key IN (%s)' % placeholders, keys).fetchone()[0]
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (%s)' % placeholders, keys)
+            connection.execute(
+                'UPDATE cache_size SET total = total - ? WHERE id = 0',
+                (freed,))
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+            connection.execute('UPDATE cache_size SET total = 0 WHERE id = 0')
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами: открытие файла
+        # и PRAGMA дороже, чем сам поход в кэш.
+        pass
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE: берёт блокировку записи сразу, до чтения."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
@@ -0,0 +1,61 @@
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import (
+    Command as CreateCacheTable)
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from core.cache import SQLiteCache
+
+BENCHMARK_TABLE = 'yatube_cache_benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время попадания в кэш для SQLiteCache, LocMemCache '
+        'и DatabaseCache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10000)
+        parser.add_argument(
+            '--size', type=int, default=2048,
+            help='Размер значения в байтах (фрагмент шаблона).')
+
+    def handle(self, *args, **options):
+        creator = CreateCacheTable(stdout=self.stdout, stderr=self.stderr)
+        creator.verbosity = options['verbosity']
+        creator.create_table(DEFAULT_DB_ALIAS, BENCHMARK_TABLE, dry_run=False)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                backends = {
+                    'SQLiteCache': SQLiteCache(
+                        os.path.join(directory, 'cache.sqlite3'), {}),
+                    'LocMemCache': LocMemCache('benchmark', {}),
+                    'DatabaseCache': DatabaseCache(BENCHMARK_TABLE, {}),
+                }
+                for name, backend in backends.items():
+                    self.report(name, backend, options)
+        finally:
+            with connection.schema_editor() as editor:
+                editor.execute(
+                    f'DROP TABLE {editor.quote_name(BENCHMARK_TABLE)}')
+
+    def report(self, name, backend, options):
+        value = 'x' * options['size']
+        backend.set('fragment', value, None)
+        samples = []
+        for _ in range(options['iterations']):
+            start = time.perf_counter()
+            backend.get('fragment')
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        median = statistics.median(samples) * 1e6
+        p99 = samples[int(len(samples) * 0.99) - 1] * 1e6
+        self.stdout.write(
+            f'{name:<14} медиана {median:8.1f} мкс   p99 {p99:8.1f} мкс')
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from core.storage import HashedFileSystemStorage
+
+
+def hashed_file_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if (isinstance(field, models.FileField)
+                    and isinstance(field.storage, HashedFileSystemStorage)):
+                yield model, field
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит медиафайлы, загруженные до хранилища с адресацией по '
+        'содержимому, в шардированные каталоги и объединяет дубликаты. '
+        'Файлы хешируются и переносятся параллельно, ссылки в базе '
+        'обновляются в основном потоке.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for model, field in hashed_file_fields():
+                moved = self.migrate_field(
+                    pool, model, field, options['batch_size'])
+                self.stdout.write(
+                    f'{model._meta.label}.{field.name}: '
+                    f'перенесено файлов {moved}')
+
+    def migrate_field(self, pool, model, field, batch_size):
+        storage = field.storage
+        names = (
+            model._default_manager.exclude(**{field.name: ''})
+            .order_by().values_list(field.name, flat=True).distinct()
+        )
+        pending = [name for name in names if not storage.is_hashed(name)]
+        moved = 0
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            for name, target in zip(batch, pool.map(
+                    lambda name: self.adopt(storage, name), batch)):
+                if target is None:
+                    continue
+                count = model._default_manager.filter(
+                    **{field.name: name}).update(**{field.name: target})
+                storage.add_reference(
+                    target, count, size=storage.size(target))
+                moved += 1
+        return moved
+
+    def adopt(self, storage, name):
+        try:
+            return storage.adopt(name)
+        except OSError as error:
+            self.stderr.write(f'{name}: {error}')
+            return None
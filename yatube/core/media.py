@@ -0,0 +1,159 @@
+"""Отдача медиафайлов в продакшене.
+
+Сам файл Django не читает: при MEDIA_ACCEL = 'nginx' ответ содержит
+только X-Accel-Redirect на internal-location, при 'sendfile' —
+X-Sendfile (Apache, lighttpd). Без фронтенда файл отдаётся через
+FileResponse: WSGI-сервер с wsgi.file_wrapper (gunicorn, uWSGI) шлёт
+его через sendfile(), в том числе для запросов с Range.
+
+Пример для nginx:
+
+    location /protected-media/ {
+        internal;
+        alias /srv/yatube/media/;
+    }
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+from .storage import HASHED_NAME
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Когда файл всё же читает Python (нет file_wrapper), то крупными кусками.
+BLOCK_SIZE = 64 * 1024
+
+
+class RangeFile:
+    """Файл, читаемый с offset и не дальше offset + length.
+
+    fileno() и tell() отдаются как есть: file_wrapper gunicorn сам
+    отправит нужный кусок через sendfile() по Content-Length.
+    """
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.remaining = length
+        file.seek(offset)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно или None для нераспознанного Range.
+
+    Поддерживается один диапазон: браузеры и плееры другого не шлют.
+    """
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        raise ValueError('unsatisfiable range')
+    return start, end
+
+
+def _etag(name, stat):
+    # У имён по содержимому хеш уже в имени.
+    if HASHED_NAME.match(name):
+        return quote_etag(os.path.splitext(os.path.basename(name))[0])
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def _headers(response, name, stat, etag):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = (
+        IMMUTABLE if HASHED_NAME.match(name)
+        else f'public, max-age={settings.MEDIA_MAX_AGE}')
+    return response
+
+
+def _accel_response(name, full_path, content_type):
+    if settings.MEDIA_ACCEL == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + name
+        return response
+    if settings.MEDIA_ACCEL == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+    return None
+
+
+def _file_response(request, full_path, stat, etag, content_type):
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and if_range in (None, etag):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(file, start, end - start + 1),
+            status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response.block_size = BLOCK_SIZE
+    return response
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    name = path.replace('\\', '/')
+    etag = _etag(name, stat)
+    content_type = mimetypes.guess_type(full_path)[0]
+    content_type = content_type or 'application/octet-stream'
+
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponse(status=304)
+    else:
+        response = (
+            _accel_response(name, full_path, content_type)
+            or _file_response(request, full_path, stat, etag, content_type)
+        )
+    if response.status_code == 416:
+        return response
+    return _headers(response, name, stat, etag)
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from .media import BLOCK_SIZE, IMMUTABLE
+
+logger = logging.getLogger('yatube.sql')
+
+WHITESPACE = re.compile(r'\s+')
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    """Обёртка execute_wrapper, собирающая статистику запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.monotonic() - start
+            self.count += 1
+            shape = WHITESPACE.sub(' ', sql).strip()
+            self.statements[(shape, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(
+            number - 1 for number in self.statements.values() if number > 1
+        )
+
+    def n_plus_one(self, threshold):
+        """Одинаковые по форме запросы, повторённые с разными параметрами.
+
+        Считаются различные наборы параметров: точные повторы одного
+        и того же запроса видны в duplicates.
+        """
+        distinct = Counter(shape for shape, _ in self.statements)
+        return {
+            hashlib.md5(shape.encode()).hexdigest()[:8]: {
+                'count': number,
+                'sql': shape[:120],
+            }
+            for shape, number in distinct.items()
+            if number >= threshold
+        }
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы каждого запроса и сверяет их с бюджетом вьюхи.
+
+    Итог отдаётся в заголовке Server-Timing и одной JSON-строкой в логе
+    yatube.sql. Бюджеты задаются в SQL_BUDGETS по имени вьюхи; при
+    превышении пишется предупреждение, а с SQL_BUDGET_RAISE = True
+    выбрасывается QueryBudgetExceeded (удобно в тестах).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        duration = stats.duration * 1000
+        response['Server-Timing'] = (
+            f'sql;dur={duration:.1f};desc="{stats.count} queries"'
+        )
+        record = {
+            'view': view_name,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'sql_ms': round(duration, 1),
+            'duplicates': stats.duplicates,
+            'n_plus_one': stats.n_plus_one(settings.SQL_N_PLUS_ONE_THRESHOLD),
+        }
+        logger.info(json.dumps(record, ensure_ascii=False))
+
+        budget = settings.SQL_BUDGETS.get(view_name)
+        if budget is not None and stats.count > budget:
+            message = (
+                f'{view_name}: {stats.count} SQL-запросов '
+                f'при бюджете {budget}'
+            )
+            if settings.SQL_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={'sql_stats': record})
+        return response
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную collectstatic статику из STATIC_ROOT.
+
+    Если клиент принимает gzip и рядом лежит .gz-копия, отдаётся она
+    с Content-Encoding: gzip — сжатие сделано один раз при сборке.
+    Имена с хешем из манифеста кэшируются навсегда (immutable), прочие —
+    на STATIC_MAX_AGE секунд. Файлов нет — запрос идёт дальше, как обычно.
+    Стоит в начале MIDDLEWARE, чтобы статика не проходила через сессии
+    и аутентификацию.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        path = request.path_info
+        if (settings.STATIC_ROOT and request.method in ('GET', 'HEAD')
+                and path.startswith(settings.STATIC_URL)):
+            response = self.serve(request, path[len(settings.STATIC_URL):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            full_path = safe_join(settings.STATIC_ROOT, name)
+        except (ValueError, SuspiciousFileOperation):
+            return None
+        if not os.path.isfile(full_path):
+            return None
+        gzipped = full_path + '.gz'
+        has_gzip = os.path.isfile(gzipped)
+        use_gzip = has_gzip and ACCEPTS_GZIP.search(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        served = gzipped if use_gzip else full_path
+        stat = os.stat(served)
+        etag = quote_etag('{:x}-{:x}{}'.format(
+            stat.st_size, stat.st_mtime_ns, '-gz' if use_gzip else ''))
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(full_path)[0]
+            response = FileResponse(
+                open(served, 'rb'),
+                content_type=content_type or 'application/octet-stream')
+            response.block_size = BLOCK_SIZE
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+        if has_gzip:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        is_hashed = getattr(staticfiles_storage, 'is_hashed', None)
+        response['Cache-Control'] = (
+            IMMUTABLE if is_hashed and is_hashed(name.replace('\\', '/'))
+            else f'public, max-age={settings.STATIC_MAX_AGE}')
+        return response
@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class MediaBlob(models.Model):
+    """Файл в хранилище с адресацией по содержимому.
+
+    Одинаковые загрузки хранятся одним файлом; refcount — сколько
+    ссылок на него выдано. Файл удаляется, когда счётчик доходит до нуля.
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField(default=0)
+    size = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
@@ -0,0 +1,193 @@
+import base64
+import binascii
+import heapq
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу вместо OFFSET.
+
+    Страница выбирается условием по колонкам сортировки, поэтому любая
+    страница стоит одного диапазонного прохода по индексу, а COUNT(*)
+    не выполняется вовсе. ``object_list`` может быть списком querysets
+    с одинаковой сортировкой: их страницы сливаются в одну.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None, key=None):
+        if not isinstance(object_list, (list, tuple)):
+            object_list = [object_list]
+        self.sources = list(object_list)
+        model = self.sources[0].model
+        if ordering is None:
+            ordering = [
+                field for field in model._meta.ordering
+                if field.lstrip('-') not in ('pk', 'id')
+            ]
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering = ordering + ['-pk' if descending else 'pk']
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+        self.key = tuple(key or self.fields)
+        self.descending = self.ordering[0].startswith('-')
+        self._has_next = False
+        self._has_previous = False
+        super().__init__(self.sources[0], per_page)
+
+    def _check_object_list_is_ordered(self):
+        # Порядок задаёт сам паджинатор через ordering.
+        pass
+
+    @cached_property
+    def count(self):
+        # Общее число объектов неизвестно: COUNT(*) не выполняется.
+        return None
+
+    @cached_property
+    def num_pages(self):
+        return 1 + self._has_previous + self._has_next
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    @staticmethod
+    def _value(item, attr):
+        # Строки values() — словари, остальное — объекты.
+        if isinstance(item, dict):
+            return item[attr]
+        return getattr(item, attr)
+
+    def encode_cursor(self, direction, item):
+        values = [self._value(item, attr) for attr in self.key]
+        raw = json.dumps([direction] + [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+        except (TypeError, ValueError, UnicodeDecodeError, binascii.Error):
+            return None
+        if direction not in (FORWARD, BACKWARD):
+            return None
+        if len(values) != len(self.key):
+            return None
+        model = self.sources[0].model
+        try:
+            values = [
+                self._to_python(model, attr, value)
+                for attr, value in zip(self.key, values)
+            ]
+        except Exception:
+            return None
+        return direction, values
+
+    @staticmethod
+    def _to_python(model, attr, value):
+        if attr == 'pk':
+            attr = model._meta.pk.name
+        try:
+            return model._meta.get_field(attr).to_python(value)
+        except Exception:
+            return value
+
+    def _boundary(self, values, after):
+        """Условие «строго после/до курсора» в порядке сортировки.
+
+        Первое поле ограничивается нестрогим сравнением, чтобы СУБД
+        могла начать проход по индексу прямо с позиции курсора.
+        """
+        lookup = 'lt' if self.descending == after else 'gt'
+        strict = Q()
+        for index in range(len(self.fields) - 1, -1, -1):
+            step = Q(**{f'{self.fields[index]}__{lookup}': values[index]})
+            if index < len(self.fields) - 1:
+                step |= Q(**{self.fields[index]: values[index]}) & strict
+            strict = step
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & strict
+
+    def window(self, source, values=None, after=True):
+        """Запрос одной страницы источника: условие по курсору и LIMIT."""
+        ordering = self.ordering
+        if not after:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            )
+        if values is not None:
+            source = source.filter(self._boundary(values, after))
+        return source.order_by(*ordering)[:self.per_page + 1]
+
+    def _fetch(self, values, after):
+        limit = self.per_page + 1
+        rows = [
+            list(self.window(source, values, after))
+            for source in self.sources
+        ]
+        if len(rows) == 1:
+            return rows[0]
+        merged = []
+        seen = set()
+        reverse = self.descending == after
+        for item in heapq.merge(*rows, key=self._sort_key, reverse=reverse):
+            item_key = self._sort_key(item)
+            if item_key in seen:
+                continue
+            seen.add(item_key)
+            merged.append(item)
+            if len(merged) == limit:
+                break
+        return merged
+
+    def _sort_key(self, item):
+        return tuple(self._value(item, attr) for attr in self.key)
+
+    def get_page(self, cursor):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        direction, values = decoded or (FORWARD, None)
+        after = direction == FORWARD
+        items = self._fetch(values, after)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if after:
+            self._has_next = has_more
+            self._has_previous = values is not None
+        else:
+            items.reverse()
+            self._has_next = True
+            self._has_previous = has_more
+        self.__dict__.pop('num_pages', None)
+        page = Page(items, 1 + self._has_previous, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items and self._has_next:
+            page.next_cursor = self.encode_cursor(FORWARD, items[-1])
+        if items and self._has_previous:
+            page.previous_cursor = self.encode_cursor(BACKWARD, items[0])
+        # Ключ для кэша фрагментов: границы страницы, а не присланный
+        # курсор. Мусорный курсор даёт первую страницу и её же ключ,
+        # так что подбором курсоров кэш не засорить.
+        boundaries = [self._sort_key(item) for item in items[:1] + items[-1:]]
+        page.cache_key = (
+            f'{self._has_previous:d}{self._has_next:d}:{boundaries}')
+        return page
+
+    def page(self, number):
+        return self.get_page(number)
+
+
+def get_cursor_page(request, object_list, per_page, **kwargs):
+    paginator = CursorPaginator(object_list, per_page, **kwargs)
+    return paginator.get_page(request.GET.get('cursor'))
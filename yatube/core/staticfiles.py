@@ -0,0 +1,74 @@
+"""Статика с хешем в имени и заранее сжатыми копиями.
+
+collectstatic кладёт рядом с каждым файлом копию с хешем содержимого
+в имени (css/bootstrap.min.3f1c….css) и записывает манифест, а для
+текстовых форматов ещё и .gz-копию. {% static %} выдаёт имена
+с хешем, поэтому их можно кэшировать навсегда; отдаёт их
+core.middleware.StaticFilesMiddleware.
+"""
+import gzip
+from io import BytesIO
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+# Картинки и шрифты уже сжаты, gzip их только увеличит.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ico', '.json', '.map', '.txt',
+                '.xml', '.html')
+# Сжатая копия, выигрывающая меньше этой доли, не нужна.
+MIN_RATIO = 0.95
+
+
+def gzip_bytes(data):
+    buffer = BytesIO()
+    # mtime=0: одинаковое содержимое даёт одинаковый .gz при каждом
+    # collectstatic.
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+                       mtime=0) as compressed:
+        compressed.write(data)
+    return buffer.getvalue()
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Без collectstatic (разработка, тесты) манифеста нет: тогда
+    # {% static %} выдаёт обычное имя, а не падает.
+    manifest_strict = False
+    _hashed_names = None
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def is_hashed(self, name):
+        """Имя с хешем из манифеста: такой файл не меняется никогда."""
+        if self._hashed_names is None:
+            self._hashed_names = frozenset(self.hashed_files.values())
+        return name in self._hashed_names
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        self._hashed_names = None
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            compressed = self.compress(name)
+            if compressed:
+                yield name, compressed, True
+
+    def compress(self, name):
+        """Пишет name.gz, если это текстовый файл и сжатие имеет смысл."""
+        if not name.endswith(COMPRESSIBLE) or not self.exists(name):
+            return None
+        with self.open(name) as original:
+            data = original.read()
+        compressed = gzip_bytes(data)
+        if len(compressed) > len(data) * MIN_RATIO:
+            return None
+        gz_name = name + '.gz'
+        if self.exists(gz_name):
+            self.delete(gz_name)
+        self._save(gz_name, ContentFile(compressed))
+        return gz_name
@@ -0,0 +1,110 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Имя файла — SHA-256 содержимого, разложенный по двум уровням
+подкаталогов: posts/ab/cd/abcd….jpg. В одном каталоге остаётся не
+больше нескольких сотен файлов, а повторная загрузка той же картинки
+не создаёт копию, только увеличивает счётчик ссылок в MediaBlob.
+Django сам файлы не удаляет, поэтому ссылку снимают сигналы постов
+при удалении поста и замене картинки.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+HASHED_NAME = re.compile(
+    r'^(?:.*/)?[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w+)?$')
+# Подкаталоги-шарды в конце пути: их не наследует новое имя.
+SHARDS = re.compile(r'(?:/[0-9a-f]{2}/[0-9a-f]{2})+$')
+
+
+def file_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    def hashed_name(self, name, digest):
+        # Имя может быть уже хешированным (пересохранение после
+        # нормализации, варианты): шарды старого имени отбрасываются,
+        # иначе каталоги вложились бы друг в друга.
+        directory = SHARDS.sub('', os.path.dirname(name).replace('\\', '/'))
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        ).replace('\\', '/')
+
+    def is_hashed(self, name):
+        return bool(HASHED_NAME.match(name))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, file_digest(content))
+        if self.exists(name):
+            # Файл снова в деле: reclaim_media судит о сиротах по mtime
+            # и не должен удалить его как давно забытый.
+            os.utime(self.path(name))
+        else:
+            # Между exists() и записью тот же файл может сохранить
+            # параллельная загрузка: тогда _save выберет другое имя,
+            # и получится вторая копия — лишняя, но корректная.
+            name = self._save(name, content)
+        self.add_reference(name, size=content.size)
+        return name
+
+    def add_reference(self, name, count=1, size=0):
+        from .models import MediaBlob
+
+        updated = MediaBlob.objects.filter(name=name).update(
+            refcount=F('refcount') + count)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, refcount=count, size=size)
+        except IntegrityError:
+            MediaBlob.objects.filter(name=name).update(
+                refcount=F('refcount') + count)
+
+    def delete(self, name):
+        """Снимает одну ссылку; файл удаляется вместе с последней.
+
+        Файлы, которых нет в MediaBlob (записанные до этого хранилища),
+        удаляются сразу.
+        """
+        from .models import MediaBlob
+
+        if MediaBlob.objects.filter(name=name, refcount__gt=1).update(
+                refcount=F('refcount') - 1):
+            return
+        deleted, _ = MediaBlob.objects.filter(name=name).delete()
+        if deleted or not self.is_hashed(name):
+            super().delete(name)
+
+    def adopt(self, name):
+        """Переносит существующий файл name под имя по содержимому.
+
+        Если такой файл уже есть, исходный просто удаляется. Счётчик
+        ссылок не меняется: это делает вызывающий код, зная, сколько
+        записей ссылается на файл.
+        """
+        with self.open(name) as content:
+            target = self.hashed_name(name, file_digest(content))
+        if target == name:
+            return name
+        if self.exists(target):
+            os.remove(self.path(name))
+            return target
+        os.makedirs(os.path.dirname(self.path(target)), exist_ok=True)
+        os.replace(self.path(name), self.path(target))
+        return target
@@ -0,0 +1,87 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_process_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='yatube-background',
+        )
+    return _executor
+
+
+def _init_process():
+    django.setup()
+    # После fork дочерний процесс получает копии соединений родителя.
+    # Закрывать их нельзя — это закрыло бы и соединения родителя,
+    # поэтому просто забываем их и открываем свои.
+    for connection in connections.all():
+        connection.connection = None
+
+
+def _get_process_executor():
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            initializer=_init_process,
+        )
+    return _process_executor
+
+
+def _submit_to_process(func, args, kwargs):
+    global _process_executor
+    try:
+        _get_process_executor().submit(_run, func, args, kwargs)
+    except BrokenProcessPool:
+        # Упавший воркер ломает весь пул: создаём новый.
+        logger.warning('Пул процессов сломан, пересоздаём')
+        _process_executor = None
+        _get_process_executor().submit(_run, func, args, kwargs)
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s упала', func.__name__)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Выполняет функцию в пуле потоков после коммита транзакции.
+
+    При BACKGROUND_WORKERS = 0 функция выполняется сразу, в текущем
+    потоке и в текущей транзакции: так удобно в тестах и при отладке.
+    """
+    if not settings.BACKGROUND_WORKERS:
+        return func(*args, **kwargs)
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, func, args, kwargs)
+    )
+
+
+def run_in_process(func, *args, **kwargs):
+    """Выполняет функцию в пуле процессов после коммита транзакции.
+
+    Для работы, упирающейся в CPU (обработка изображений), которой
+    мешал бы GIL в пуле потоков. Функция и аргументы должны
+    сериализоваться pickle. При IMAGE_WORKERS = 0 выполняется сразу.
+    """
+    if not settings.IMAGE_WORKERS:
+        return func(*args, **kwargs)
+    transaction.on_commit(lambda: _submit_to_process(func, args, kwargs))
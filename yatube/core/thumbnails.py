@@ -0,0 +1,99 @@
+"""Миниатюры sorl-thumbnail без генерации во время запроса.
+
+Тег {% thumbnail %} при промахе в key-value хранилище декодирует
+оригинал и пишет миниатюру прямо в запросе. Здесь генерация вынесена
+в фоновые задачи, а шаблоны только смотрят в хранилище.
+"""
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, options):
+        """ImageFile миниатюры: только имя, без обращения к хранилищу."""
+        source = ImageFile(file_)
+        # Те же опции по умолчанию, что в ThumbnailBackend.get_thumbnail:
+        # от них зависит имя файла миниатюры.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_cached(self, file_, geometry_string, **options):
+        """Возвращает готовую миниатюру из хранилища или None."""
+        if not file_:
+            return None
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, options))
+
+    def get_cached_many(self, files, geometry_string, **options):
+        """Как get_cached, но для многих файлов сразу: {имя файла: миниатюра}.
+
+        С cached_db-хранилищем это один get_many к кэшу и не больше
+        одного запроса к базе на все промахи.
+        """
+        files = [file_ for file_ in files if file_]
+        if not isinstance(default.kvstore, CachedDBKVStore):
+            return {
+                str(file_): self.get_cached(
+                    file_, geometry_string, **options)
+                for file_ in files
+            }
+        keys = {
+            add_prefix(self.thumbnail_file(
+                file_, geometry_string, dict(options)).key): str(file_)
+            for file_ in files
+        }
+        kv_cache = default.kvstore.cache
+        values = kv_cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            # Промахи тоже кэшируем, как это делает сам KVStore.
+            fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            kv_cache.set_many(
+                fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fetched)
+        return {
+            name: (
+                deserialize_image_file(values[key])
+                if values[key] and values[key] is not EMPTY_VALUE else None
+            )
+            for key, name in keys.items()
+        }
+
+
+backend = CachedThumbnailBackend()
+
+
+def cached_thumbnail(file_, geometry_string, **options):
+    return backend.get_cached(file_, geometry_string, **options)
+
+
+def cached_thumbnails(files, geometry_string, **options):
+    return backend.get_cached_many(files, geometry_string, **options)
+
+
+def generate_thumbnails(file_, variants):
+    """Создаёт миниатюры файла; variants — пары (геометрия, опции).
+
+    file_ — FieldFile, а не имя: ключ в хранилище sorl зависит от
+    хранилища исходного файла, и он должен совпасть с тем, по которому
+    миниатюру потом ищут шаблоны.
+    """
+    for geometry_string, options in variants:
+        get_thumbnail(file_, geometry_string, **options)
@@ -0,0 +1,176 @@
+"""Приём картинок: потоковая загрузка, проверка по заголовку, очистка.
+
+LimitedImageUploadHandler пишет файл на диск кусками и перестаёт
+принимать его, как только превышен размер или по заголовку видно,
+что пикселей слишком много. После check_header_only форма проверяет
+только заголовок — Pillow не декодирует картинку в потоке запроса.
+Поворот по EXIF и удаление метаданных (normalize_image) делаются
+позже, в пуле процессов.
+"""
+import types
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Сколько начала файла копить, пытаясь прочитать заголовок.
+HEADER_LIMIT = 256 * 1024
+# Форматы, которые пересохраняются без метаданных. GIF не трогаем:
+# EXIF в нём нет, а пересохранение теряет анимацию.
+NORMALIZED_FORMATS = {'JPEG': {'quality': 90}, 'PNG': {}, 'WEBP': {}}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+
+def _too_large_message():
+    return 'Файл больше {} МБ.'.format(
+        settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024))
+
+
+def _check_pixels(size):
+    width, height = size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        return 'Картинка слишком большая: {}×{} пикселей.'.format(
+            width, height)
+    return None
+
+
+def read_header(data):
+    """Формат и размер картинки по заголовку, без декодирования.
+
+    None, если заголовок не распознан. Image.open ленивый: пиксели
+    читаются только при load().
+    """
+    try:
+        with Image.open(data) as image:
+            return image.format, image.size
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        # Pillow сам отказывается открывать огромные картинки; выше
+        # MAX_IMAGE_PIXELS предупреждение — тоже ошибка (core.apps).
+        return None, (settings.IMAGE_MAX_PIXELS + 1, 1)
+    except Exception:
+        return None
+
+
+class LimitedImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл и отбрасывает её при превышении
+    IMAGE_UPLOAD_MAX_SIZE или IMAGE_MAX_PIXELS.
+
+    Ошибка сохраняется в атрибуте upload_error файла: её показывает
+    форма, а остаток тела запроса дочитывается без записи на диск.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = bytearray()
+        self.header_done = False
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self._reject(_too_large_message())
+            return None
+        if not self.header_done:
+            self._check_header(raw_data)
+            if self.error:
+                return None
+        self.file.write(raw_data)
+        return None
+
+    def _check_header(self, raw_data):
+        self.header += raw_data
+        header = read_header(BytesIO(self.header))
+        if header is None and len(self.header) < HEADER_LIMIT:
+            return
+        # Не распознали за HEADER_LIMIT — пусть решает валидация формы.
+        self.header_done = True
+        self.header = None
+        if header is not None:
+            error = _check_pixels(header[1])
+            if error:
+                self._reject(error)
+
+    def _reject(self, error):
+        self.error = error
+        self.file.seek(0)
+        self.file.truncate()
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.upload_error = self.error
+        return file
+
+
+def _header_to_python(field, data):
+    f = forms.FileField.to_python(field, data)
+    if f is None:
+        return None
+    error = getattr(data, 'upload_error', None)
+    if error:
+        raise ValidationError(error, code='upload_limit')
+    if hasattr(data, 'temporary_file_path'):
+        header = read_header(data.temporary_file_path())
+    else:
+        header = read_header(data)
+        data.seek(0)
+    if header is None:
+        raise ValidationError(
+            field.error_messages['invalid_image'], code='invalid_image')
+    format_, size = header
+    error = _check_pixels(size)
+    if error:
+        raise ValidationError(error, code='upload_limit')
+    if format_ not in ALLOWED_FORMATS:
+        raise ValidationError(
+            field.error_messages['invalid_image'], code='invalid_image')
+    f.content_type = Image.MIME.get(format_)
+    return f
+
+
+def check_header_only(field):
+    """Переводит forms.ImageField на проверку картинки по заголовку.
+
+    Стандартный to_python вызывает verify(), а он читает весь файл.
+    Класс поля остаётся прежним: на forms.ImageField рассчитаны
+    шаблоны и тесты форм.
+    """
+    field.to_python = types.MethodType(_header_to_python, field)
+    return field
+
+
+def normalize_image(name, storage=default_storage):
+    """Поворачивает картинку по EXIF и пересохраняет её без метаданных.
+
+    Возвращает (новое имя, (ширина, высота)). Если метаданных нет или
+    формат не обрабатывается, имя остаётся прежним. Старый файл
+    не удаляется.
+    """
+    with storage.open(name) as source:
+        image = Image.open(source)
+        options = NORMALIZED_FORMATS.get(image.format)
+        has_metadata = (
+            any(key in image.info for key in METADATA_KEYS)
+            or getattr(image, 'text', None)
+        )
+        # Чистый файл не пересжимаем: каждое сохранение JPEG — потери.
+        if options is None or not has_metadata:
+            return name, image.size
+        format_ = image.format
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        buffer = BytesIO()
+        # exif и текстовые блоки не передаются — они и отбрасываются.
+        # Цветовой профиль оставляем, без него поедут цвета.
+        if icc_profile:
+            options = {**options, 'icc_profile': icc_profile}
+        image.save(buffer, format=format_, **options)
+    return storage.save(name, ContentFile(buffer.getvalue())), image.size
@@ -0,0 +1,91 @@
+"""Адаптивные варианты картинок для srcset.
+
+Оригинал декодируется один раз: из него вырезается кадр нужных
+пропорций, а все ширины и форматы получаются уменьшением этого кадра.
+Манифест — JSON вида {"webp": [[имя, ширина, высота], ...],
+"jpeg": [...]}, по возрастанию ширины.
+"""
+import base64
+import json
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps, features
+
+QUALITY = {'JPEG': 80, 'WEBP': 75}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+def available_formats():
+    # Pillow может быть собран без libwebp.
+    if features.check('webp'):
+        return ('WEBP', 'JPEG')
+    return ('JPEG',)
+
+
+def _encode(image, format_):
+    buffer = BytesIO()
+    image.save(buffer, format=format_, quality=QUALITY[format_],
+               optimize=True)
+    return buffer.getvalue()
+
+
+def load_frame(name, size, storage=default_storage):
+    """Декодирует картинку и вырезает из неё кадр размера size."""
+    with storage.open(name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        return ImageOps.fit(image, size, Image.LANCZOS)
+
+
+def generate_variants(frame, name, widths, storage=default_storage):
+    """Сохраняет уменьшенные копии кадра frame и возвращает манифест.
+
+    name — имя оригинала, от него строятся имена вариантов; widths —
+    ширины вариантов не больше ширины кадра.
+    """
+    width, height = frame.size
+    stem = os.path.join('variants', os.path.splitext(name)[0])
+    manifest = {}
+    for format_ in available_formats():
+        entries = []
+        for variant_width in sorted(widths):
+            variant_height = round(height * variant_width / width)
+            variant = frame.resize(
+                (variant_width, variant_height), Image.LANCZOS)
+            saved = storage.save(
+                f'{stem}-{variant_width}w.{EXTENSIONS[format_]}',
+                ContentFile(_encode(variant, format_)))
+            entries.append([saved, variant_width, variant_height])
+        manifest[format_.lower()] = entries
+    return manifest
+
+
+def placeholder(frame, width=16):
+    """Крошечная размытая копия кадра (LQIP) в виде data: URI.
+
+    Около полукилобайта: её можно положить прямо в HTML и растянуть
+    CSS-ом, пока грузится настоящая картинка.
+    """
+    height = max(1, round(frame.size[1] * width / frame.size[0]))
+    tiny = frame.resize((width, height), Image.BOX)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    tiny.save(buffer, format='JPEG', quality=40)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{data}'
+
+
+def dump_manifest(manifest):
+    return json.dumps(manifest, separators=(',', ':'))
+
+
+def load_manifest(value):
+    # Битый манифест не должен ронять страницу: покажем миниатюру.
+    try:
+        manifest = json.loads(value) if value else {}
+    except ValueError:
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from.models import Comment, Group, Post, Follow
+from .models import Comment, Group, Post, Follow
+from .search import is_supported, match_expression, post_ids
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +11,14 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по FTS-индексу вместо LIKE '%...%' по всей таблице.
+        match = match_expression(search_term)
+        if not match or not is_supported():
+            return super().get_search_results(
+                request, queryset, search_term)
+        return queryset.filter(pk__in=post_ids(match)), False
+
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('pk', 'post', 'text')
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import search, signals  # noqa: F401
+
+        # Миграции, пересобирающие таблицы постов, удаляют триггеры
+        # поискового индекса.
+        post_migrate.connect(search.ensure_index, sender=self)
@@ -0,0 +1,97 @@
+"""ETag для условных GET-запросов.
+
+Считается по самому свежему посту ленты и версиям из posts.versions,
+без рендера страницы. Last-Modified не отдаётся: дата свежего поста
+не меняется от правки, удаления, смены зрителя или курсора, и 304
+по ней показывал бы устаревшую страницу. Результат кэшируется
+на объекте request, чтобы condition и сама вьюха не ходили в базу
+дважды.
+"""
+import hashlib
+
+from . import versions
+from .models import Group, Post, User
+
+
+def _memo(request, key, func):
+    memo = request.__dict__.setdefault('_conditional_memo', {})
+    if key not in memo:
+        memo[key] = func()
+    return memo[key]
+
+
+def _etag(*parts):
+    return hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def _newest(queryset):
+    return queryset.order_by('-pub_date', '-id').values_list(
+        'pub_date', 'id').first() or (None, None)
+
+
+def _feed(request, namespace, object_id, queryset):
+    pub_date, post_id = _newest(queryset)
+    return _etag(
+        namespace, object_id, versions.get_version(namespace, object_id),
+        pub_date, post_id, request.user.pk, request.get_full_path(),
+    )
+
+
+def _index(request):
+    return _memo(request, 'index', lambda: _feed(
+        request, versions.GLOBAL, None, Post.objects.all()))
+
+
+def _group(request, slug):
+    def compute():
+        group_id = Group.objects.filter(
+            slug=slug).values_list('pk', flat=True).first()
+        if group_id is None:
+            return None
+        return _feed(request, versions.GROUP, group_id,
+                     Post.objects.filter(group_id=group_id))
+    return _memo(request, 'group', compute)
+
+
+def _profile(request, username):
+    def compute():
+        author_id = User.objects.filter(
+            username=username).values_list('pk', flat=True).first()
+        if author_id is None:
+            return None
+        return _feed(request, versions.AUTHOR, author_id,
+                     Post.objects.filter(author_id=author_id))
+    return _memo(request, 'profile', compute)
+
+
+def _post(request, post_id):
+    def compute():
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True).first()
+        if author_id is None:
+            return None
+        return _etag(
+            'post', post_id,
+            versions.get_version(versions.POST, post_id),
+            versions.get_version(versions.AUTHOR, author_id),
+            request.user.pk, request.get_full_path(),
+        )
+    return _memo(request, 'post', compute)
+
+
+def index_etag(request):
+    return _index(request)
+
+
+def group_etag(request, slug):
+    return _group(request, slug)
+
+
+def profile_etag(request, username):
+    return _profile(request, username)
+
+
+def post_etag(request, post_id):
+    return _post(request, post_id)
@@ -0,0 +1,38 @@
+from django.db.models import F
+
+from .models import Group, Post, UserStats
+
+
+def _shift(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def add_user_stat(user_id, field, delta):
+    if delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+    _shift(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def add_followers(author_id, delta):
+    """Сдвигает счётчик подписчиков автора и возвращает его статистику."""
+    add_user_stat(author_id, 'followers_count', delta)
+    return UserStats.objects.filter(user_id=author_id).first()
+
+
+def add_group_posts(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def add_comments(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def user_stats(user):
+    """Статистика пользователя; нулевая, если он ещё ничего не сделал."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
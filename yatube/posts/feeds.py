@@ -0,0 +1,123 @@
+"""RSS и Atom для общей ленты, групп и авторов.
+
+Лента — последние FEED_ITEMS карточек одним запросом по индексу
+(-pub_date, -id). Готовый XML кэшируется по ETag из posts.conditional,
+а в ETag входит версия ленты из posts.versions: новый пост меняет
+и то и другое, и старый XML больше не используется. Поллер, пришедший
+с If-None-Match, получает 304 без рендера и без чтения кэша XML.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from . import conditional
+from .models import Group, Post, User
+
+FEED_ITEMS = 20
+TITLE_LENGTH = 60
+
+
+class PostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов'
+
+    def link(self, obj):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).for_feed()[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(TITLE_LENGTH)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.id])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: записи сообщества {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    def posts(self, obj):
+        return Post.objects.filter(group=obj)
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: записи {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Новые записи автора {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def posts(self, obj):
+        return Post.objects.filter(author=obj)
+
+
+def atom(feed_class):
+    """Тот же Feed в формате Atom."""
+    return type(f'Atom{feed_class.__name__}', (feed_class,), {
+        'feed_type': Atom1Feed,
+        'subtitle': feed_class.description,
+    })
+
+
+def cached_feed(feed_class, etag_func):
+    """Вьюха ленты с условным GET и кэшем XML по ETag."""
+    feed = feed_class()
+
+    @condition(etag_func=etag_func)
+    def view(request, **kwargs):
+        # Значение уже посчитано для condition и лежит в memo запроса.
+        etag = etag_func(request, **kwargs)
+        key = f'syndication:{etag}'
+        cached = cache.get(key) if etag else None
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = feed(request, **kwargs)
+        if etag and response.status_code == 200:
+            cache.set(key, (response.content, response['Content-Type']),
+                      settings.FEED_CACHE_TIMEOUT)
+        return response
+    return view
+
+
+index_rss = cached_feed(PostsFeed, conditional.index_etag)
+index_atom = cached_feed(atom(PostsFeed), conditional.index_etag)
+group_rss = cached_feed(GroupFeed, conditional.group_etag)
+group_atom = cached_feed(atom(GroupFeed), conditional.group_etag)
+profile_rss = cached_feed(AuthorFeed, conditional.profile_etag)
+profile_atom = cached_feed(atom(AuthorFeed), conditional.profile_etag)
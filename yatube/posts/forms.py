@@ -1,9 +1,15 @@
 from django import forms
 
+from core.uploads import check_header_only
+
 from .models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        check_header_only(self.fields['image'])
+
     class Meta:
         model = Post
         labels = {'text': 'Текст', 'group': 'Группа', 'image': 'Картинка'}
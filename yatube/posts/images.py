@@ -0,0 +1,90 @@
+from django.core.files.storage import default_storage
+
+from core.tasks import run_in_process
+from core.thumbnails import cached_thumbnails, generate_thumbnails
+from core.uploads import normalize_image
+from core.variants import (dump_manifest, generate_variants, load_frame,
+                           placeholder)
+
+from . import versions
+from .models import Post
+
+# Варианты картинки поста, которые рисуют шаблоны лент и страницы поста.
+FEED_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+VARIANTS = (FEED_THUMBNAIL,)
+# Ширины для srcset: кадр тех же пропорций, что и FEED_THUMBNAIL.
+RESPONSIVE_SIZE = (960, 339)
+RESPONSIVE_WIDTHS = (320, 640, 960)
+
+
+def image_file(name):
+    """FieldFile картинки поста по имени, без загрузки самого поста."""
+    field = Post._meta.get_field('image')
+    return field.attr_class(None, field, name)
+
+
+def normalize_post_image(post_id, name):
+    """Заменяет картинку поста очищенной копией, см. normalize_image.
+
+    Возвращает новое имя или None, если картинку поста уже заменили.
+    """
+    new_name, (width, height) = normalize_image(name)
+    if new_name == name:
+        return name
+    updated = Post.objects.filter(pk=post_id, image=name).update(
+        image=new_name, image_width=width, image_height=height)
+    default_storage.delete(name if updated else new_name)
+    return new_name if updated else None
+
+
+def generate_post_thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'image', 'author_id', 'group_id').first()
+    if post is None or not post[0]:
+        return
+    image, author_id, group_id = post
+    image = normalize_post_image(post_id, image)
+    if image is None:
+        return
+    generate_thumbnails(image_file(image), VARIANTS)
+    frame = load_frame(image, RESPONSIVE_SIZE)
+    manifest = generate_variants(frame, image, RESPONSIVE_WIDTHS)
+    # Если картинку успели заменить, манифест уже не про неё.
+    Post.objects.filter(pk=post_id, image=image).update(
+        image_variants=dump_manifest(manifest),
+        image_placeholder=placeholder(frame))
+    # В закэшированных фрагментах вместо картинки заглушка.
+    versions.bump_post(author_id, group_id)
+    versions.bump(versions.POST, post_id)
+
+
+def queue_thumbnails(post):
+    """Ставит генерацию миниатюр картинки поста в пул процессов."""
+    if post.image:
+        run_in_process(generate_post_thumbnails, post.pk)
+
+
+class PageThumbnails:
+    """Миниатюры всех постов страницы ленты.
+
+    Загружаются одним пакетным запросом к кэшу при первом обращении:
+    если фрагмент ленты взят из кэша, обращения не будет вовсе.
+    """
+
+    def __init__(self, posts):
+        self._posts = posts
+        self._thumbnails = None
+
+    def get(self, post):
+        if self._thumbnails is None:
+            geometry, options = FEED_THUMBNAIL
+            # Постам с готовыми вариантами миниатюра не нужна.
+            posts = [
+                post for post in self._posts
+                if post.image and not post.image_variants
+            ]
+            found = cached_thumbnails(
+                [post.image for post in posts], geometry, **options)
+            self._thumbnails = {
+                post.pk: found.get(post.image.name) for post in posts}
+        return self._thumbnails.get(post.pk)
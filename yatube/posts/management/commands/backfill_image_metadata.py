@@ -0,0 +1,36 @@
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.variants import load_frame, placeholder
+from posts.images import RESPONSIVE_SIZE
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и размытое превью картинок у постов, '
+        'загруженных до появления этих полей.'
+    )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            Q(image_width__isnull=True) | Q(image_placeholder='')
+        ).values_list('pk', 'image')
+        filled = 0
+        for post_id, name in posts.iterator():
+            try:
+                with default_storage.open(name) as image:
+                    width, height = get_image_dimensions(image)
+                frame = load_frame(name, RESPONSIVE_SIZE)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Пост {post_id}, {name}: {error}')
+                continue
+            Post.objects.filter(pk=post_id).update(
+                image_width=width,
+                image_height=height,
+                image_placeholder=placeholder(frame),
+            )
+            filled += 1
+        self.stdout.write(f'Заполнено постов: {filled}')
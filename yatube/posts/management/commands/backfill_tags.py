@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.tags import index_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает хештеги и упоминания в уже существующих постах. '
+        'Идёт пачками по первичному ключу, каждая пачка — отдельная '
+        'короткая транзакция; повторный запуск ничего не дублирует.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--start-id', type=int, default=0,
+            help='Продолжить с постов, у которых id больше этого.')
+
+    def handle(self, *args, **options):
+        last_pk = options['start_id']
+        total = 0
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'text', 'pub_date')
+                [:options['chunk_size']]
+            )
+            if not posts:
+                break
+            with transaction.atomic():
+                index_posts(posts)
+            last_pk = posts[-1][0]
+            total += len(posts)
+            self.stdout.write(f'Обработано постов: {total}, id до {last_pk}')
+        self.stdout.write(f'Готово: {total}')
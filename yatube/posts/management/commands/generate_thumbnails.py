@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.thumbnails import cached_thumbnail
+from posts.images import (FEED_THUMBNAIL, generate_post_thumbnails,
+                          image_file)
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры картинок постов: например, для '
+        'постов, загруженных через админку или до фоновой генерации.'
+    )
+
+    def handle(self, *args, **options):
+        geometry, thumbnail_options = FEED_THUMBNAIL
+        created = 0
+        posts = Post.objects.exclude(image='').values_list('pk', 'image')
+        for post_id, image in posts.iterator():
+            if cached_thumbnail(
+                    image_file(image), geometry, **thumbnail_options):
+                continue
+            generate_post_thumbnails(post_id)
+            created += 1
+        self.stdout.write(f'Создано миниатюр: {created}')
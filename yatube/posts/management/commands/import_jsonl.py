@@ -0,0 +1,325 @@
+"""Массовый импорт пользователей, групп, постов, комментариев и подписок.
+
+Одна строка файла — одна запись:
+
+    {"type": "user", "username": "leo", "first_name": "Лев",
+     "last_name": "Толстой", "email": "", "password": "<хеш>",
+     "date_joined": "2020-01-01T00:00:00+00:00"}
+    {"type": "group", "slug": "classics", "title": "Классики",
+     "description": "..."}
+    {"type": "post", "id": 17, "author": "leo", "group": "classics",
+     "text": "...", "pub_date": "...", "image": "posts/....jpg"}
+    {"type": "comment", "id": 5, "post": 17, "author": "leo",
+     "text": "...", "created": "..."}
+    {"type": "follow", "user": "leo", "author": "anna"}
+
+Пользователи и группы ищутся по username и slug, id постов
+и комментариев сохраняются: старые ссылки /posts/<id>/ продолжают
+работать, а повторная запись той же пачки ничего не дублирует.
+Записи пишутся bulk_create, без save() и сигналов, поэтому счётчики,
+ленты подписок и поисковый индекс пересобираются в конце.
+Индекс — даже если импорт оборвался или запущен с --skip-rebuild.
+"""
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import Truncator
+
+from posts import search, tags, timeline, versions
+from posts.models import (
+    PREVIEW_LENGTH, Comment, Follow, Group, Post, User, UserStats)
+
+# Порядок записи внутри пачки: сначала то, на что ссылаются.
+TYPES = ('user', 'group', 'post', 'comment', 'follow')
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'не дата: {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+@contextmanager
+def imported_dates():
+    """Даёт bulk_create записать даты из файла.
+
+    С auto_now_add Django подставил бы вместо них текущее время.
+    """
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class NaturalKeys:
+    """Словарь естественный ключ → id, дочитываемый из базы пачками."""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.ids = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if missing:
+            self.ids.update(self.model.objects.filter(
+                **{f'{self.field}__in': missing}
+            ).values_list(self.field, 'id'))
+
+    def __getitem__(self, key):
+        if key not in self.ids:
+            raise ValueError(f'нет {self.model.__name__} {key!r}')
+        return self.ids[key]
+
+
+class Checkpoint:
+    """Сколько файла уже записано: смещение, номер строки, счётчики."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {'offset': 0, 'line': 0, 'rows': 0, 'skipped': 0}
+
+    def save(self, state):
+        # Через временный файл: оборванная запись не испортит прогресс.
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует JSONL-файл пачками bulk_create, каждая пачка — '
+        'отдельная транзакция. Прогресс пишется в checkpoint, '
+        'повторный запуск продолжает с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл прогресса, по умолчанию <path>.checkpoint.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с начала файла, не глядя на checkpoint.')
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересобирать счётчики, ленты и индекс после импорта.')
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(
+            options['checkpoint'] or options['path'] + '.checkpoint')
+        state = checkpoint.load()
+        if options['restart']:
+            state = {'offset': 0, 'line': 0, 'rows': 0, 'skipped': 0}
+        self.users = NaturalKeys(User, 'username')
+        self.groups = NaturalKeys(Group, 'slug')
+        # Триггеры обновляли бы индекс построчно; в конце он
+        # пересобирается целиком. Возвращаются они в любом случае:
+        # после ошибки, Ctrl-C или с --skip-rebuild новые посты иначе
+        # так и не попали бы в поиск.
+        search.drop_triggers()
+        try:
+            self.load(options, checkpoint, state)
+        finally:
+            self.stdout.write('Поисковый индекс')
+            search.ensure_index()
+        if not options['skip_rebuild']:
+            self.rebuild()
+
+    def load(self, options, checkpoint, state):
+        started = time.monotonic()
+        rows_before = state['rows']
+        with open(options['path'], 'rb') as source, imported_dates():
+            source.seek(state['offset'])
+            for records, size, lines in self.batches(
+                    source, options['batch_size'], state['line']):
+                with transaction.atomic():
+                    written, skipped = self.write(records)
+                state['offset'] += size
+                state['line'] += lines
+                state['rows'] += written
+                state['skipped'] += skipped
+                checkpoint.save(state)
+                rate = (state['rows'] - rows_before) / max(
+                    time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f'Строка {state["line"]}: записано {state["rows"]}, '
+                    f'пропущено {state["skipped"]}, {rate:.0f} строк/с')
+
+    def batches(self, source, batch_size, line):
+        """Пачки [(номер строки, запись)] с размером в байтах и строках."""
+        records, size, lines = [], 0, 0
+        for raw in source:
+            size += len(raw)
+            lines += 1
+            if raw.strip():
+                try:
+                    records.append((line + lines, json.loads(raw)))
+                except ValueError as error:
+                    raise CommandError(f'Строка {line + lines}: {error}')
+            if len(records) >= batch_size:
+                yield records, size, lines
+                line += lines
+                records, size, lines = [], 0, 0
+        if lines:
+            yield records, size, lines
+
+    def write(self, records):
+        by_type = defaultdict(list)
+        skipped = 0
+        for line, record in records:
+            if isinstance(record, dict) and record.get('type') in TYPES:
+                by_type[record['type']].append((line, record))
+            else:
+                self.stderr.write(f'Строка {line}: неизвестная запись')
+                skipped += 1
+        written = 0
+        for type_ in TYPES:
+            if by_type[type_]:
+                objects = getattr(self, f'write_{type_}s')(by_type[type_])
+                written += objects
+                skipped += len(by_type[type_]) - objects
+        return written, skipped
+
+    def build(self, records, factory):
+        """Объекты из записей; записи с ошибками пропускаются."""
+        objects = []
+        for line, record in records:
+            try:
+                objects.append(factory(record))
+            except (KeyError, TypeError, ValueError) as error:
+                self.stderr.write(f'Строка {line}: {error!r}')
+        return objects
+
+    def write_users(self, records):
+        users = self.build(records, lambda record: User(
+            username=record['username'],
+            email=record.get('email', ''),
+            first_name=record.get('first_name', ''),
+            last_name=record.get('last_name', ''),
+            password=record.get('password') or make_password(None),
+            date_joined=parse_date(record.get('date_joined')),
+        ))
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        self.users.load(user.username for user in users)
+        return len(users)
+
+    def write_groups(self, records):
+        groups = self.build(records, lambda record: Group(
+            slug=record['slug'],
+            title=record['title'],
+            description=record.get('description', ''),
+        ))
+        Group.objects.bulk_create(groups, ignore_conflicts=True)
+        self.groups.load(group.slug for group in groups)
+        return len(groups)
+
+    def write_posts(self, records):
+        self.users.load(record.get('author') for _, record in records)
+        self.groups.load(record.get('group') for _, record in records)
+
+        def make(record):
+            return Post(
+                id=int(record['id']),
+                author_id=self.users[record['author']],
+                group_id=(
+                    self.groups[record['group']]
+                    if record.get('group') else None),
+                text=record['text'],
+                preview=Truncator(record['text']).chars(PREVIEW_LENGTH),
+                pub_date=parse_date(record.get('pub_date')),
+                image=record.get('image') or '',
+            )
+        posts = self.build(records, make)
+        Post.objects.bulk_create(posts, ignore_conflicts=True)
+        # Теги — по тексту из базы: пост с тем же id мог уже быть.
+        tags.index_posts(Post.objects.filter(
+            pk__in=[post.pk for post in posts]
+        ).values_list('pk', 'text', 'pub_date'))
+        return len(posts)
+
+    def write_comments(self, records):
+        self.users.load(record.get('author') for _, record in records)
+        post_ids = set(Post.objects.filter(
+            pk__in=[record.get('post') for _, record in records]
+        ).values_list('pk', flat=True))
+
+        def make(record):
+            if record['post'] not in post_ids:
+                raise ValueError(f'нет поста {record["post"]!r}')
+            return Comment(
+                id=int(record['id']),
+                post_id=record['post'],
+                author_id=self.users[record['author']],
+                text=record['text'],
+                created=parse_date(record.get('created')),
+            )
+        comments = self.build(records, make)
+        Comment.objects.bulk_create(comments, ignore_conflicts=True)
+        return len(comments)
+
+    def write_follows(self, records):
+        self.users.load(
+            name for _, record in records
+            for name in (record.get('user'), record.get('author')))
+
+        def make(record):
+            follow = Follow(
+                user_id=self.users[record['user']],
+                author_id=self.users[record['author']],
+            )
+            if follow.user_id == follow.author_id:
+                raise ValueError('подписка на себя')
+            return follow
+        follows = self.build(records, make)
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return len(follows)
+
+    def rebuild(self):
+        self.stdout.write('Пересчёт счётчиков')
+        call_command('reconcile_counters', stdout=self.stdout)
+        self.stdout.write('Ленты подписок')
+        UserStats.objects.filter(
+            followers_count__gte=settings.TIMELINE_PULL_THRESHOLD
+        ).update(pull_timeline=True)
+        follows = Follow.objects.filter(
+            author__stats__pull_timeline=False
+        ).values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            timeline.backfill(user_id, author_id)
+        versions.bump(versions.GLOBAL)
+        for group_id in Group.objects.values_list('pk', flat=True):
+            versions.bump(versions.GROUP, group_id)
+        for user_id in self.users.ids.values():
+            versions.bump(versions.AUTHOR, user_id)
+        self.stdout.write('Готово')
@@ -0,0 +1,190 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default as thumbnail_default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.models import MediaBlob
+from core.variants import load_manifest
+from posts.images import image_file
+from posts.models import Post
+
+# Каталоги MEDIA_ROOT, которыми владеют посты: оригиналы, варианты
+# для srcset и миниатюры sorl-thumbnail.
+MEDIA_DIRS = ('posts', 'variants', thumbnail_settings.THUMBNAIL_PREFIX)
+
+
+def walk(root, directory):
+    """Файлы каталога: [(имя относительно root, размер, mtime)]."""
+    found = []
+    stack = [os.path.join(root, directory)]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                name = os.path.relpath(entry.path, root).replace('\\', '/')
+                found.append((name, stat.st_size, stat.st_mtime))
+    return found
+
+
+def shards(root):
+    """Подкаталоги MEDIA_DIRS: их обходят параллельно."""
+    for directory in MEDIA_DIRS:
+        path = os.path.join(root, directory)
+        if not os.path.isdir(path):
+            continue
+        for entry in os.scandir(path):
+            if entry.is_dir(follow_symlinks=False):
+                yield os.path.join(directory, entry.name)
+            else:
+                yield entry.path
+
+
+def walk_shard(root, shard):
+    path = os.path.join(root, shard)
+    if os.path.isdir(path):
+        return walk(root, shard)
+    stat = os.stat(path)
+    name = os.path.relpath(path, root).replace('\\', '/')
+    return [(name, stat.st_size, stat.st_mtime)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Находит файлы картинок, на которые не ссылается ни один пост '
+        '(заменённые и удалённые картинки, их варианты и миниатюры), '
+        'и удаляет их пачками с ограничением скорости. Без --delete '
+        'только показывает, сколько места можно освободить.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--rate', type=float, default=5,
+            help='Не больше стольких пачек удаления в секунду.')
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе стольких секунд: '
+                 'их может сохранять ещё не закоммиченный запрос.')
+
+    def handle(self, *args, **options):
+        root = default_storage.path('')
+        # Дерево обходится в пуле потоков, пока основной поток читает
+        # ссылки из базы.
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            walks = [
+                pool.submit(walk_shard, root, shard)
+                for shard in shards(root)
+            ]
+            # Счётчики до обхода: выросший к удалению счётчик значит,
+            # что файл успели загрузить заново.
+            refcounts = dict(
+                MediaBlob.objects.values_list('name', 'refcount').iterator())
+            referenced, thumbnail_keys = self.references()
+            cutoff = time.time() - options['min_age']
+            orphans = [
+                (name, size)
+                for future in walks
+                for name, size, mtime in future.result()
+                if name not in referenced and mtime < cutoff
+            ]
+        total = sum(size for _, size in orphans)
+        self.stdout.write(
+            f'Без ссылок: {len(orphans)} файлов, {total / 2 ** 20:.1f} МБ')
+        if options['delete']:
+            self.delete(orphans, thumbnail_keys, refcounts, cutoff, options)
+
+    def references(self):
+        """Имена файлов, на которые ссылаются посты, и ключи sorl
+        всех миниатюр (имя → ключ), чтобы удалить записи о сиротах."""
+        referenced = set()
+        source_keys = set()
+        posts = Post.objects.exclude(image='').values_list(
+            'image', 'image_variants')
+        for image, variants in posts.iterator():
+            referenced.add(image)
+            source_keys.add(ImageFile(image_file(image)).key)
+            for entries in load_manifest(variants).values():
+                referenced.update(name for name, _, _ in entries)
+
+        thumbnail_names = {}
+        thumbnails_of = {}
+        rows = KVStore.objects.filter(
+            key__startswith=thumbnail_settings.THUMBNAIL_KEY_PREFIX
+        ).values_list('key', 'value')
+        for raw_key, value in rows.iterator():
+            identity = raw_key.split('||')[-2]
+            key = del_prefix(raw_key)
+            if identity == 'image':
+                thumbnail_names[key] = deserialize(value)['name']
+            elif identity == 'thumbnails':
+                thumbnails_of[key] = deserialize(value)
+        for source_key in source_keys:
+            for key in thumbnails_of.get(source_key, ()):
+                if key in thumbnail_names:
+                    referenced.add(thumbnail_names[key])
+        thumbnail_keys = {
+            name: key for key, name in thumbnail_names.items()}
+        return referenced, thumbnail_keys
+
+    def in_use(self, names, refcounts):
+        """Имена из names, на которые сослались уже после обхода."""
+        used = set(Post.objects.filter(
+            image__in=names).values_list('image', flat=True))
+        blobs = MediaBlob.objects.filter(
+            name__in=names).values_list('name', 'refcount')
+        used.update(
+            name for name, refcount in blobs
+            if refcount > refcounts.get(name, 0))
+        return used
+
+    def delete(self, orphans, thumbnail_keys, refcounts, cutoff, options):
+        interval = 1 / options['rate'] if options['rate'] > 0 else 0
+        freed = 0
+        kept = 0
+        for start in range(0, len(orphans), options['batch_size']):
+            started = time.monotonic()
+            batch = orphans[start:start + options['batch_size']]
+            # Пока шёл обход, файл мог понадобиться снова: новый пост
+            # с той же картинкой или повторная загрузка (она обновляет
+            # mtime). Проверяем прямо перед удалением.
+            used = self.in_use([name for name, _ in batch], refcounts)
+            names = []
+            for name, size in batch:
+                path = default_storage.path(name)
+                try:
+                    if name in used or os.stat(path).st_mtime >= cutoff:
+                        kept += 1
+                        continue
+                    os.remove(path)
+                    freed += size
+                except FileNotFoundError:
+                    pass
+                names.append(name)
+            MediaBlob.objects.filter(name__in=names).delete()
+            keys = [
+                add_prefix(thumbnail_keys[name], identity)
+                for name in names if name in thumbnail_keys
+                for identity in ('image', 'thumbnails')
+            ]
+            if keys:
+                thumbnail_default.kvstore._delete_raw(*keys)
+            time.sleep(max(0, interval - (time.monotonic() - started)))
+        self.stdout.write(
+            f'Удалено: {freed / 2 ** 20:.1f} МБ, '
+            f'снова используются: {kept} файлов')
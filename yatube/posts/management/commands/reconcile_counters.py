@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# (владелец счётчика, модель со счётчиком, поле, что считаем, по какому FK)
+COUNTERS = (
+    (Group, Group, 'posts_count', Post, 'group'),
+    (Post, Post, 'comments_count', Comment, 'post'),
+    (User, UserStats, 'posts_count', Post, 'author'),
+    (User, UserStats, 'followers_count', Follow, 'author'),
+    (User, UserStats, 'following_count', Follow, 'user'),
+)
+
+
+def chunks(model, size):
+    last_pk = 0
+    while True:
+        ids = list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Находит и исправляет расхождения денормализованных счётчиков. '
+        'Работает пачками по диапазонам первичного ключа, каждая пачка '
+        'исправляется отдельной короткой транзакцией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не менять.')
+
+    def handle(self, *args, **options):
+        for owner, store, field, counted, fk in COUNTERS:
+            fixed = 0
+            for ids in chunks(owner, options['chunk_size']):
+                fixed += self.reconcile_chunk(
+                    ids, store, field, counted, fk, options['dry_run'])
+            self.stdout.write(
+                f'{store.__name__}.{field}: расхождений {fixed}')
+
+    def reconcile_chunk(self, ids, store, field, counted, fk, dry_run):
+        if store is UserStats and not dry_run:
+            UserStats.objects.bulk_create(
+                [UserStats(user_id=pk) for pk in ids],
+                ignore_conflicts=True,
+            )
+        actual = dict(
+            counted.objects.filter(**{f'{fk}__in': ids})
+            .values_list(fk).annotate(total=Count('pk')).order_by()
+        )
+        stored = dict(
+            store.objects.filter(pk__in=ids).values_list('pk', field))
+        drifted = [
+            pk for pk in ids if stored.get(pk, 0) != actual.get(pk, 0)
+        ]
+        if drifted and not dry_run:
+            # Значение пересчитывается в том же UPDATE, поэтому
+            # параллельные инкременты не теряются между чтением и записью.
+            total = (
+                counted.objects.filter(**{fk: OuterRef('pk')})
+                .order_by().values(fk).annotate(total=Count('pk'))
+                .values('total')
+            )
+            with transaction.atomic():
+                store.objects.filter(pk__in=drifted).update(
+                    **{field: Coalesce(Subquery(total), 0)})
+        return len(drifted)
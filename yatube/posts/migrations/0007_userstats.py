@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_followers(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    counts = Follow.objects.values('author_id').annotate(
+        total=models.Count('id')).order_by()
+    UserStats.objects.bulk_create([
+        UserStats(
+            user_id=row['author_id'],
+            followers_count=row['total'],
+            pull_timeline=row['total'] >= settings.TIMELINE_PULL_THRESHOLD,
+        )
+        for row in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(help_text='Пользователь', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers_count', models.PositiveIntegerField(default=0, help_text='Число подписчиков')),
+                ('pull_timeline', models.BooleanField(default=False, help_text='Посты автора подмешиваются в ленты при чтении')),
+            ],
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
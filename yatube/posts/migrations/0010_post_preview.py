@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:21
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_previews(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    for post in Post.objects.only('id', 'text').iterator():
+        Post.objects.filter(pk=post.pk).update(
+            preview=Truncator(post.text).chars(300))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='preview',
+            field=models.CharField(blank=True, editable=False, help_text='Начало текста для лент', max_length=300),
+        ),
+        migrations.RunPython(fill_previews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from posts.search import ensure_index
+    ensure_index(schema_editor.connection.alias)
+
+
+def drop_index(apps, schema_editor):
+    from posts.search import drop_index
+    drop_index(schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,11 +1,102 @@
 from django.contrib.auth import get_user_model
+from django.core.files.images import get_image_dimensions
 from django.db import models
+from django.db.models.query import BaseIterable, ValuesIterable
+from django.utils.text import Truncator
 
 User = get_user_model()
 
+PREVIEW_LENGTH = 300
+
+
+class PostCard:
+    """Лёгкая карточка поста для лент: только то, что рисует шаблон."""
+
+    __slots__ = (
+        'id', 'pub_date', 'text', 'image', 'image_variants',
+        'image_placeholder', 'author', 'group',
+    )
+
+    def __init__(self, id, pub_date, text, image, image_variants,
+                 image_placeholder, author, group):
+        self.id = id
+        self.pub_date = pub_date
+        self.text = text
+        self.image = image
+        self.image_variants = image_variants
+        self.image_placeholder = image_placeholder
+        self.author = author
+        self.group = group
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return f'<PostCard {self.id}>'
+
+
+class PostCardIterable(BaseIterable):
+    """Собирает карточки из строк values(), не создавая экземпляры Post."""
+
+    def __iter__(self):
+        image_field = Post._meta.get_field('image')
+        authors = {}
+        groups = {}
+        for row in ValuesIterable(
+            self.queryset, self.chunked_fetch, self.chunk_size
+        ):
+            author = authors.get(row['author_id'])
+            if author is None:
+                author = authors[row['author_id']] = User(
+                    id=row['author_id'],
+                    username=row['author__username'],
+                    first_name=row['author__first_name'],
+                    last_name=row['author__last_name'],
+                )
+            group = None
+            if row['group_id'] is not None:
+                group = groups.get(row['group_id'])
+                if group is None:
+                    group = groups[row['group_id']] = Group(
+                        id=row['group_id'],
+                        slug=row['group__slug'],
+                        title=row['group__title'],
+                    )
+            yield PostCard(
+                id=row['id'],
+                pub_date=row['pub_date'],
+                text=row['preview'],
+                image=image_field.attr_class(None, image_field, row['image']),
+                image_variants=row['image_variants'],
+                image_placeholder=row['image_placeholder'],
+                author=author,
+                group=group,
+            )
+
+
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'id', 'pub_date', 'preview', 'image', 'image_variants',
+        'image_placeholder', 'author_id', 'author__username',
+        'author__first_name', 'author__last_name',
+        'group_id', 'group__slug', 'group__title',
+    )
+
+    def for_feed(self):
+        """Карточки постов одним запросом, без полного текста."""
+        queryset = self.values(*self.FEED_FIELDS)
+        queryset._iterable_class = PostCardIterable
+        return queryset
+
 
 class Post(models.Model):
     text = models.TextField()
+    preview = models.CharField(
+        max_length=PREVIEW_LENGTH,
+        blank=True,
+        editable=False,
+        help_text='Начало текста для лент')
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='дата публикации')
     author = models.ForeignKey(
@@ -28,18 +119,66 @@ class Post(models.Model):
         blank=True,
         help_text='Картинка поста'
     )
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        help_text='Размытое превью картинки (data: URI)')
+    image_variants = models.TextField(
+        blank=True,
+        editable=False,
+        help_text='JSON-манифест адаптивных вариантов картинки')
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text='Число комментариев')
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        self.preview = Truncator(self.text).chars(PREVIEW_LENGTH)
+        # Не width_field/height_field: с ними ImageField открывает файл
+        # при создании каждого экземпляра, у которого размеры не заполнены.
+        # Здесь размеры читаются из заголовка только что загруженного файла.
+        if not self.image:
+            self.image_width = self.image_height = None
+        elif not self.image._committed:
+            self.image_width, self.image_height = get_image_dimensions(
+                self.image)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'preview'}
+        super().save(*args, **kwargs)
+
     class Meta:
-        ordering = ("-pub_date",)
+        ordering = ("-pub_date", "-id")
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'),
+        ]
 
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text='Число постов в группе')
 
     def __str__(self):
         return self.title
@@ -62,6 +201,13 @@ class Comment(models.Model):
     def __str__(self):
         return self.text
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -81,3 +227,108 @@ class Follow(models.Model):
                 fields=['author', 'user'],
                 name='unique_follower')
         ]
+        indexes = [
+            models.Index(fields=['user', 'author'], name='follow_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        help_text='Владелец ленты')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        help_text='Пост в ленте')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text='Автор поста')
+    pub_date = models.DateTimeField(help_text='Дата публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx')
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        help_text='Пользователь')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Число постов')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Число подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Число подписок')
+    pull_timeline = models.BooleanField(
+        default=False,
+        help_text='Посты автора подмешиваются в ленты при чтении')
+
+
+class PostTag(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tags',
+        help_text='Пост с хештегом')
+    tag = models.CharField(
+        max_length=100,
+        help_text='Хештег без решётки, в нижнем регистре')
+    pub_date = models.DateTimeField(help_text='Дата публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'tag'],
+                name='unique_post_tag')
+        ]
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date', '-post'],
+                name='post_tag_date_idx')
+        ]
+
+
+class Mention(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        help_text='Пост с упоминанием')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        help_text='Упомянутый пользователь')
+    pub_date = models.DateTimeField(help_text='Дата публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'user'],
+                name='unique_mention')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='mention_user_date_idx')
+        ]
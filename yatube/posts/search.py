@@ -0,0 +1,191 @@
+"""Полнотекстовый поиск по постам и комментариям (SQLite FTS5).
+
+Индексы — FTS5-таблицы с внешним содержимым: сам текст хранится только
+в posts_post и posts_comment, а индексы обновляют триггеры. Пересборка
+таблицы в миграциях SQLite удаляет её триггеры, поэтому после каждого
+migrate ensure_index проверяет их и, если чего-то нет, создаёт заново
+и переиндексирует текст.
+
+Результаты ранжируются по bm25; совпадение в комментарии весит меньше,
+чем в самом посте. На других СУБД поиск работает через icontains.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+
+from core.paginator import CursorPaginator
+
+from .models import Post
+
+# Совпадение в комментарии весит вдвое меньше: bm25 отрицательный,
+# и чем он меньше, тем выше пост в выдаче.
+COMMENT_WEIGHT = 0.5
+MAX_TERMS = 8
+TERM = re.compile(r'\w+')
+
+INDEXES = {
+    'posts_post_fts': 'posts_post',
+    'posts_comment_fts': 'posts_comment',
+}
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+    "text, content='{table}', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+TRIGGERS = {
+    '{index}_ai': (
+        'AFTER INSERT ON {table} BEGIN '
+        'INSERT INTO {index}(rowid, text) VALUES (new.id, new.text); END'
+    ),
+    '{index}_ad': (
+        'AFTER DELETE ON {table} BEGIN '
+        "INSERT INTO {index}({index}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); END"
+    ),
+    '{index}_au': (
+        'AFTER UPDATE OF text ON {table} BEGIN '
+        "INSERT INTO {index}({index}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO {index}(rowid, text) VALUES (new.id, new.text); END'
+    ),
+}
+
+RANKED_HITS = """
+    SELECT post_id, MIN(score) AS score FROM (
+        SELECT rowid AS post_id, bm25(posts_post_fts) AS score
+        FROM posts_post_fts WHERE posts_post_fts MATCH %s
+        UNION ALL
+        SELECT comment.post_id, bm25(posts_comment_fts) * %s AS score
+        FROM posts_comment_fts
+        JOIN posts_comment AS comment ON comment.id = posts_comment_fts.rowid
+        WHERE posts_comment_fts MATCH %s
+    )
+    GROUP BY post_id
+    {having}
+    ORDER BY score {order}, post_id {order}
+    LIMIT %s
+"""
+
+Hit = namedtuple('Hit', ('post_id', 'score'))
+
+
+def is_supported(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def ensure_index(using='default', **kwargs):
+    """Создаёт недостающие индексы и триггеры; True, если что-то создано.
+
+    Подключается к post_migrate и вызывается из миграции.
+    """
+    if not is_supported(using):
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master '
+            "WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        created = False
+        for index, table in INDEXES.items():
+            names = [index] + [
+                name.format(index=index) for name in TRIGGERS]
+            if all(name in existing for name in names):
+                continue
+            cursor.execute(CREATE_INDEX.format(index=index, table=table))
+            for name, body in TRIGGERS.items():
+                name = name.format(index=index)
+                if name not in existing:
+                    cursor.execute(f'CREATE TRIGGER {name} ' + body.format(
+                        index=index, table=table))
+            # Пока триггеров не было, текст мог меняться мимо индекса.
+            cursor.execute(
+                f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+            created = True
+    return created
+
+
+def drop_triggers(using='default'):
+    """Отключает обновление индекса, например на время массового импорта.
+
+    Индекс догоняет текст при следующем ensure_index.
+    """
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        for index in INDEXES:
+            for name in TRIGGERS:
+                cursor.execute(
+                    f'DROP TRIGGER IF EXISTS {name.format(index=index)}')
+
+
+def drop_index(using='default'):
+    if not is_supported(using):
+        return
+    drop_triggers(using)
+    with connections[using].cursor() as cursor:
+        for index in INDEXES:
+            cursor.execute(f'DROP TABLE IF EXISTS {index}')
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5: все слова, каждое в кавычках.
+
+    Операторы FTS5 (NEAR, OR, *, ^ и т. п.) из ввода не проходят, поэтому
+    синтаксическая ошибка в MATCH невозможна. '' — искать нечего.
+    """
+    terms = TERM.findall(query.lower())[:MAX_TERMS]
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def ranked_hits(match, values, after, limit):
+    """Посты, подходящие под match, по рангу: [Hit]. values — курсор."""
+    having = ''
+    params = [match, COMMENT_WEIGHT, match]
+    if values is not None:
+        lookup = '>' if after else '<'
+        having = (f'HAVING score {lookup} %s '
+                  f'OR (score = %s AND post_id {lookup} %s)')
+        params += [values[0], values[0], values[1]]
+    sql = RANKED_HITS.format(having=having, order='ASC' if after else 'DESC')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return [Hit(*row) for row in cursor.fetchall()]
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсор по (ранг, id поста) вместо колонок модели."""
+
+    def __init__(self, match, per_page):
+        super().__init__(
+            Post.objects.none(), per_page,
+            ordering=('score', 'post_id'), key=('score', 'post_id'))
+        self.match = match
+
+    def _fetch(self, values, after):
+        return ranked_hits(self.match, values, after, self.per_page + 1)
+
+
+def post_ids(match):
+    """Подзапрос id постов с совпадением в тексте — для админки."""
+    return RawSQL(
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+        (match,))
+
+
+def search_page(query, cursor, per_page):
+    """Страница карточек постов по запросу, лучшие совпадения первыми."""
+    match = match_expression(query)
+    if not match:
+        return None
+    if not is_supported():
+        paginator = CursorPaginator(
+            Post.objects.filter(text__icontains=query).for_feed(), per_page)
+        return paginator.get_page(cursor)
+    page = SearchPaginator(match, per_page).get_page(cursor)
+    ids = [hit.post_id for hit in page.object_list]
+    cards = {card.id: card for card in Post.objects.filter(
+        pk__in=ids).for_feed()}
+    page.object_list = [cards[pk] for pk in ids if pk in cards]
+    return page
@@ -0,0 +1,127 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.tasks import run_in_background
+
+from . import counters, tags, timeline, versions
+from .models import Comment, Follow, Group, Post, User
+
+
+def release_image(name):
+    """Снимает ссылку поста на файл картинки (счётчик в MediaBlob).
+
+    Счётчик есть только у файлов с именем по содержимому; старые файлы
+    без него убирает reclaim_media, проверив, что ссылок не осталось.
+    """
+    storage = Post._meta.get_field('image').storage
+    is_hashed = getattr(storage, 'is_hashed', None)
+    if name and is_hashed and is_hashed(name):
+        run_in_background(storage.delete, name)
+
+
+@receiver(pre_save, sender=Post)
+def handle_changed_post(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    old = Post.objects.filter(
+        pk=instance.pk).values_list('group_id', 'image').first()
+    if old is None:
+        return
+    old_group_id, old_image = old
+    if old_group_id != instance.group_id:
+        counters.add_group_posts(old_group_id, -1)
+        counters.add_group_posts(instance.group_id, 1)
+        if old_group_id is not None:
+            versions.bump(versions.GROUP, old_group_id)
+    # Django не удаляет заменённый файл сам: ссылку на него снимаем
+    # здесь, а новая картинка получит свою при сохранении поля.
+    if old_image != instance.image.name:
+        release_image(old_image)
+
+
+@receiver(post_save, sender=Post)
+def handle_saved_post(sender, instance, created, raw=False, **kwargs):
+    versions.bump_post(instance.author_id, instance.group_id)
+    versions.bump(versions.POST, instance.pk)
+    if created and not raw:
+        counters.add_user_stat(instance.author_id, 'posts_count', 1)
+        counters.add_group_posts(instance.group_id, 1)
+        run_in_background(timeline.fan_out_post, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_tags(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'text' not in update_fields):
+        return
+    tags.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def handle_deleted_post(sender, instance, **kwargs):
+    versions.bump_post(instance.author_id, instance.group_id)
+    counters.add_user_stat(instance.author_id, 'posts_count', -1)
+    counters.add_group_posts(instance.group_id, -1)
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_version(sender, instance, **kwargs):
+    versions.bump(versions.GROUP, instance.pk)
+    versions.bump(versions.GLOBAL)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_author_version(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login: ленты от него
+    # не меняются.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    versions.bump(versions.AUTHOR, instance.pk)
+    versions.bump(versions.GLOBAL)
+
+
+def bump_comment_versions(post_id):
+    # Счётчик комментариев виден и в лентах, поэтому меняются версии
+    # лент автора и группы поста, а не только версия самого поста.
+    versions.bump(versions.POST, post_id)
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is not None:
+        versions.bump_post(*post)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    bump_comment_versions(instance.post_id)
+    if created and not raw:
+        counters.add_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump_comment_versions(instance.post_id)
+    counters.add_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Число подписок видно в профиле подписчика, подписчиков — автора.
+        versions.bump(versions.AUTHOR, instance.user_id)
+        versions.bump(versions.AUTHOR, instance.author_id)
+        counters.add_user_stat(instance.user_id, 'following_count', 1)
+        stats = timeline.update_mode(
+            counters.add_followers(instance.author_id, 1))
+        if not stats.pull_timeline:
+            timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    versions.bump(versions.AUTHOR, instance.user_id)
+    versions.bump(versions.AUTHOR, instance.author_id)
+    counters.add_user_stat(instance.user_id, 'following_count', -1)
+    timeline.update_mode(counters.add_followers(instance.author_id, -1))
+    timeline.trim(instance.user_id, instance.author_id)
@@ -0,0 +1,101 @@
+"""Хештеги и упоминания в текстах постов.
+
+При сохранении поста #теги и @упоминания раскладываются в PostTag
+и Mention вместе с датой публикации. Лента по тегу или упоминаниям —
+один проход по индексу (tag, -pub_date, -post) без чтения Post.text.
+"""
+import re
+
+from django.db.models import F
+
+from .models import Mention, Post, PostTag, User
+
+TAG = re.compile(r'(?<![\w#&])#(\w{1,100})')
+MENTION = re.compile(r'(?<![\w@])@([\w.@+-]{1,150})')
+FEED_ORDERING = ('-index_date', '-index_post')
+FEED_KEY = ('pub_date', 'id')
+# Строк в одном DELETE: держимся ниже лимита параметров SQLite (999).
+DELETE_BATCH = 500
+
+
+def extract_tags(text):
+    return {tag.lower() for tag in TAG.findall(text)}
+
+
+def extract_mentions(text):
+    # Точка в конце — конец предложения, а не часть имени.
+    return {name.rstrip('.') for name in MENTION.findall(text)} - {''}
+
+
+def _sync(model, post_ids, rows, field):
+    """Оставляет у постов post_ids ровно строки rows: [(post_id, value)]."""
+    rows = set(rows)
+    existing = {
+        (post_id, value): pk
+        for pk, post_id, value in model.objects.filter(
+            post_id__in=post_ids).values_list('pk', 'post_id', field)
+    }
+    stale = [pk for key, pk in existing.items() if key not in rows]
+    for start in range(0, len(stale), DELETE_BATCH):
+        model.objects.filter(
+            pk__in=stale[start:start + DELETE_BATCH]).delete()
+    return rows - set(existing)
+
+
+def index_posts(posts):
+    """Обновляет теги и упоминания постов: [(id, text, pub_date)]."""
+    posts = list(posts)
+    if not posts:
+        return
+    post_ids = [post_id for post_id, _, _ in posts]
+    dates = {post_id: pub_date for post_id, _, pub_date in posts}
+    tags = [
+        (post_id, tag)
+        for post_id, text, _ in posts for tag in extract_tags(text)
+    ]
+    names = {
+        post_id: extract_mentions(text) for post_id, text, _ in posts}
+    users = dict(User.objects.filter(
+        username__in=set().union(*names.values())
+    ).values_list('username', 'id'))
+    mentions = [
+        (post_id, users[name])
+        for post_id, post_names in names.items()
+        for name in post_names if name in users
+    ]
+    PostTag.objects.bulk_create(
+        [
+            PostTag(post_id=post_id, tag=tag, pub_date=dates[post_id])
+            for post_id, tag in _sync(PostTag, post_ids, tags, 'tag')
+        ],
+        ignore_conflicts=True,
+    )
+    Mention.objects.bulk_create(
+        [
+            Mention(post_id=post_id, user_id=user_id,
+                    pub_date=dates[post_id])
+            for post_id, user_id in _sync(
+                Mention, post_ids, mentions, 'user_id')
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def index_post(post):
+    index_posts([(post.pk, post.text, post.pub_date)])
+
+
+def tag_feed(tag):
+    """Карточки постов с тегом для CursorPaginator."""
+    return Post.objects.filter(tags__tag=tag.lower()).annotate(
+        index_date=F('tags__pub_date'),
+        index_post=F('tags__post'),
+    ).for_feed()
+
+
+def mentions_feed(user):
+    """Карточки постов, где упомянут пользователь."""
+    return Post.objects.filter(mentions__user=user).annotate(
+        index_date=F('mentions__pub_date'),
+        index_post=F('mentions__post'),
+    ).for_feed()
@@ -0,0 +1,61 @@
+from django import template
+
+from core.thumbnails import cached_thumbnail
+from core.variants import load_manifest
+
+from ..images import FEED_THUMBNAIL
+
+register = template.Library()
+
+
+@register.simple_tag
+def feed_thumbnail(image):
+    """Готовая миниатюра для ленты или None, если её ещё не создали."""
+    geometry, options = FEED_THUMBNAIL
+    return cached_thumbnail(image, geometry, **options)
+
+
+@register.filter
+def thumbnail_for(thumbnails, post):
+    """Миниатюра поста из PageThumbnails страницы."""
+    return thumbnails.get(post)
+
+
+def _srcset(storage, entries):
+    return ', '.join(
+        f'{storage.url(name)} {width}w' for name, width, _ in entries)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post, thumbnail=None, eager=False):
+    """<picture> с srcset по манифесту вариантов.
+
+    Пока варианты не готовы — готовая миниатюра thumbnail или заглушка.
+    Картинки ниже первого экрана грузятся лениво (eager=False), место
+    под них зарезервировано width/height и размытым превью.
+    """
+    manifest = load_manifest(post.image_variants) if post.image else {}
+    storage = post.image.storage
+    sources = [
+        {'type': f'image/{kind}', 'srcset': _srcset(storage, entries)}
+        for kind, entries in manifest.items() if kind != 'jpeg'
+    ]
+    fallback = manifest.get('jpeg')
+    if fallback:
+        name, width, height = fallback[-1]
+        img = {
+            'src': storage.url(name), 'srcset': _srcset(storage, fallback),
+            'width': width, 'height': height,
+        }
+    elif thumbnail:
+        img = {'src': thumbnail.url, 'width': thumbnail.width,
+               'height': thumbnail.height}
+    else:
+        img = None
+    return {
+        'image': post.image,
+        'sources': sources,
+        'img': img,
+        'placeholder': post.image_placeholder,
+        'loading': 'eager' if eager else 'lazy',
+    }
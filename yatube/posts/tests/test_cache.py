@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': {'MAX_SIZE': 4096}},
+        )
+
+    def test_get_set_delete(self):
+        """Проверяем базовые операции SQLite-кэша"""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'other'))
+
+    def test_get_many_and_incr(self):
+        """Проверяем get_many и атомарный incr"""
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        self.assertEqual(self.cache.incr('a', 10), 11)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_entries_are_not_returned(self):
+        """Проверяем, что timeout=0 не сохраняет значение"""
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_size_limit_evicts_old_entries(self):
+        """Проверяем, что при переполнении вытесняются старые записи"""
+        for i in range(20):
+            self.cache.set(f'key-{i}', 'x' * 500)
+        self.assertIsNone(self.cache.get('key-0'))
+        self.assertEqual(self.cache.get('key-19'), 'x' * 500)
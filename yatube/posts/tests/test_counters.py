@@ -0,0 +1,63 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+
+    def test_counters_follow_changes(self):
+        """Проверяем, что счётчики меняются вместе с объектами"""
+        post = Post.objects.create(
+            text='text', author=self.author, group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='text')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+
+        follow.delete()
+        post.delete()
+        self.group.refresh_from_db()
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_reconcile_counters(self):
+        """Проверяем, что команда находит и исправляет расхождения"""
+        post = Post.objects.create(
+            text='text', author=self.author, group=self.group)
+        Group.objects.update(posts_count=7)
+        Post.objects.update(comments_count=3)
+        UserStats.objects.filter(user=self.author).delete()
+
+        out = StringIO()
+        call_command('reconcile_counters', '--chunk-size=1', stdout=out)
+        self.assertIn('Group.posts_count: расхождений 1', out.getvalue())
+        self.group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..feeds import FEED_ITEMS
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классики', slug='classics', description='description')
+        for number in range(FEED_ITEMS + 2):
+            Post.objects.create(
+                text=f'Запись {number}', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        """RSS и Atom отдаются для общей ленты, группы и автора"""
+        urls = (
+            (reverse('posts:index_rss'), 'application/rss+xml'),
+            (reverse('posts:index_atom'), 'application/atom+xml'),
+            (reverse('posts:group_rss', args=['classics']),
+             'application/rss+xml'),
+            (reverse('posts:group_atom', args=['classics']),
+             'application/atom+xml'),
+            (reverse('posts:profile_rss', args=['author']),
+             'application/rss+xml'),
+            (reverse('posts:profile_atom', args=['author']),
+             'application/atom+xml'),
+        )
+        for url, content_type in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type))
+                content = response.content.decode()
+                self.assertIn(f'Запись {FEED_ITEMS + 1}', content)
+                self.assertNotIn('Запись 1<', content)
+                self.assertIn('Лев Толстой', content)
+        response = self.client.get(reverse('posts:group_rss', args=['no']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_and_cache(self):
+        """Повторный опрос получает 304, а XML берётся из кэша"""
+        url = reverse('posts:index_rss')
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertIn('Запись', response.content.decode())
+
+        Post.objects.create(text='Новая запись', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новая запись', response.content.decode())
@@ -1,17 +1,34 @@
 import shutil
 import tempfile
+from io import BytesIO, StringIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from core.thumbnails import cached_thumbnail
+from core.uploads import read_header
+from core.variants import load_manifest
+
+from ..images import FEED_THUMBNAIL
 from ..models import Comment, Group, Post
+from .utils import run_on_commit
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION_TAG = 0x0112
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -70,6 +87,108 @@ class PostTests(TestCase):
             response, reverse('posts:profile', kwargs={'username': 'test'}))
         self.assertEqual(Post.objects.count(), post_count + 1)
 
+    @override_settings(IMAGE_WORKERS=0, BACKGROUND_WORKERS=0)
+    def test_create_generates_thumbnail(self):
+        """Миниатюра создаётся при публикации, а не при показе ленты"""
+        with run_on_commit():
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': 'Пост с картинкой',
+                    'image': SimpleUploadedFile(
+                        'thumb.gif', SMALL_GIF, content_type='image/gif'),
+                },
+            )
+        post = Post.objects.get(text='Пост с картинкой')
+        geometry, options = FEED_THUMBNAIL
+        thumbnail = cached_thumbnail(post.image, geometry, **options)
+        self.assertIsNotNone(thumbnail)
+        manifest = load_manifest(post.image_variants)
+        self.assertEqual(
+            [width for _, width, _ in manifest['jpeg']], [320, 640, 960])
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(post.image_placeholder.startswith('data:image/'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, '960w')
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+
+    def test_backfill_image_metadata(self):
+        """Команда заполняет размеры и превью у старых постов"""
+        post = Post.objects.create(
+            author=self.user, text='Старый пост',
+            image=SimpleUploadedFile(
+                'old.gif', SMALL_GIF, content_type='image/gif'))
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None, image_height=None, image_placeholder='')
+        call_command('backfill_image_metadata', stdout=StringIO())
+        post = Post.objects.values(
+            'image_width', 'image_height', 'image_placeholder').get(
+                pk=post.pk)
+        self.assertEqual((post['image_width'], post['image_height']), (2, 1))
+        self.assertTrue(post['image_placeholder'].startswith('data:image/'))
+
+    @override_settings(IMAGE_WORKERS=0)
+    def test_create_normalizes_orientation(self):
+        """Картинка поворачивается по EXIF, метаданные удаляются"""
+        exif = Image.Exif()
+        exif[ORIENTATION_TAG] = 6
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20)).save(
+            buffer, format='JPEG', exif=exif.tobytes())
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Повёрнутая картинка',
+                'image': SimpleUploadedFile(
+                    'photo.jpg', buffer.getvalue(),
+                    content_type='image/jpeg'),
+            },
+        )
+        post = Post.objects.get(text='Повёрнутая картинка')
+        self.assertEqual((post.image_width, post.image_height), (20, 40))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertNotIn('exif', image.info)
+
+    def test_upload_limits(self):
+        """Слишком большие файлы и картинки отклоняются формой"""
+        cases = (
+            ({'IMAGE_UPLOAD_MAX_SIZE': 10}, 'Файл больше'),
+            ({'IMAGE_MAX_PIXELS': 1}, 'Картинка слишком большая'),
+        )
+        for limits, message in cases:
+            with self.subTest(limits=limits), override_settings(**limits):
+                response = self.authorized_client.post(
+                    reverse('posts:post_create'),
+                    data={
+                        'text': 'Большая картинка',
+                        'image': SimpleUploadedFile(
+                            'big.gif', SMALL_GIF, content_type='image/gif'),
+                    },
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(
+                    message, response.context['form'].errors['image'][0])
+        self.assertFalse(
+            Post.objects.filter(text='Большая картинка').exists())
+
+    def test_decompression_bomb_warning_is_error(self):
+        """Картинка чуть больше MAX_IMAGE_PIXELS не открывается"""
+        buffer = BytesIO()
+        Image.new('RGB', (30, 30)).save(buffer, format='PNG')
+        limit = Image.MAX_IMAGE_PIXELS
+        # 900 пикселей: больше предела, но меньше удвоенного.
+        Image.MAX_IMAGE_PIXELS = 600
+        try:
+            too_large = (None, (settings.IMAGE_MAX_PIXELS + 1, 1))
+            self.assertEqual(read_header(buffer), too_large)
+            buffer.seek(0)
+            with self.assertRaises(Image.DecompressionBombWarning):
+                Image.open(buffer).load()
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+
     def test_edit(self):
         post_count = Post.objects.count()
         form_data = {
@@ -104,14 +223,17 @@ class PostTests(TestCase):
         self.assertEqual(Comment.objects.count(), comments_count + 1)
 
     def test_caching(self):
-        response = self.client.post(
-            reverse('posts:index'))
+        """Проверяем, что лента берётся из кэша до изменения постов"""
+        response = self.client.get(reverse('posts:index'))
         new_content = response.content
-        Post.objects.filter(text='Тестовый текст').delete()
+        Post.objects.filter(text='Тестовый текст').update(
+            preview='Изменено в обход сигналов')
         response = self.client.get(reverse('posts:index'))
-        content_after_delete = response.content
-        self.assertEqual(new_content, content_after_delete)
-        cache.clear()
+        self.assertEqual(new_content, response.content)
+
+        with run_on_commit():
+            Post.objects.filter(text='Тестовый текст').delete()
         response = self.client.get(reverse('posts:index'))
-        content_after_clear = response.content
-        self.assertNotEqual(new_content, content_after_clear)
+        content_after_delete = response.content
+        self.assertNotEqual(new_content, content_after_delete)
+        self.assertNotContains(response, 'Изменено в обход сигналов')
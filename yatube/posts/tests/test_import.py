@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from .. import search
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+RECORDS = [
+    {'type': 'user', 'username': 'leo', 'first_name': 'Лев'},
+    {'type': 'user', 'username': 'anna'},
+    {'type': 'group', 'slug': 'classics', 'title': 'Классики',
+     'description': 'description'},
+    {'type': 'post', 'id': 101, 'author': 'leo', 'group': 'classics',
+     'text': 'Все счастливые семьи похожи #семья @anna',
+     'pub_date': '1877-01-01T00:00:00'},
+    {'type': 'post', 'id': 102, 'author': 'nobody', 'text': 'потерянный'},
+    {'type': 'comment', 'id': 7, 'post': 101, 'author': 'anna',
+     'text': 'Согласна', 'created': '1877-01-02T00:00:00+00:00'},
+    {'type': 'follow', 'user': 'anna', 'author': 'leo'},
+]
+MORE = [
+    {'type': 'post', 'id': 103, 'author': 'leo', 'text': 'Вторая запись'},
+]
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class ImportTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.path = os.path.join(self.directory, 'dump.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, records, mode='w'):
+        with open(self.path, mode, encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_jsonl', self.path, '--batch-size=3', *args,
+            stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import(self):
+        """Импорт сохраняет id и даты и пересобирает производные данные"""
+        self.write(RECORDS)
+        out, err = self.run_import()
+        self.assertIn('строк/с', out)
+        self.assertIn('Строка 5', err)
+
+        post = Post.objects.get(pk=101)
+        leo = User.objects.get(username='leo')
+        anna = User.objects.get(username='anna')
+        self.assertEqual(post.author, leo)
+        self.assertEqual(post.group, Group.objects.get(slug='classics'))
+        self.assertEqual(post.pub_date.year, 1877)
+        self.assertEqual(post.preview, post.text)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get(pk=7).created.day, 2)
+        self.assertFalse(Post.objects.filter(pk=102).exists())
+        self.assertFalse(leo.has_usable_password())
+        self.assertTrue(Follow.objects.filter(user=anna, author=leo).exists())
+        self.assertEqual(leo.stats.posts_count, 1)
+        self.assertEqual(leo.stats.followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=anna, post=post).exists())
+        self.assertEqual(
+            list(post.tags.values_list('tag', flat=True)), ['семья'])
+        self.assertTrue(post.mentions.filter(user=anna).exists())
+        page = search.search_page('счастливые', None, 10)
+        self.assertEqual([card.id for card in page], [101])
+        self.assertFalse(search.ensure_index())
+
+    def test_resume_from_checkpoint(self):
+        """Повторный запуск продолжает с места остановки"""
+        self.write(RECORDS)
+        self.run_import()
+        Post.objects.filter(pk=101).update(text='изменён после импорта')
+        self.write(MORE, mode='a')
+        out, _ = self.run_import()
+        self.assertIn(f'Строка {len(RECORDS) + len(MORE)}:', out)
+        self.assertEqual(
+            Post.objects.get(pk=101).text, 'изменён после импорта')
+        self.assertTrue(Post.objects.filter(pk=103).exists())
+        self.assertEqual(
+            User.objects.get(username='leo').stats.posts_count, 2)
+
+    def test_triggers_restored(self):
+        """Триггеры индекса возвращаются после ошибки и без пересборки"""
+        self.write(RECORDS)
+        self.run_import('--skip-rebuild')
+        self.assertFalse(search.ensure_index())
+        self.assertEqual(
+            [card.id for card in search.search_page('счастливые', None, 10)],
+            [101])
+
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write('{не json\n')
+        with self.assertRaises(CommandError):
+            self.run_import()
+        self.assertFalse(search.ensure_index())
@@ -0,0 +1,67 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from core.storage import HashedFileSystemStorage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.name = HashedFileSystemStorage(TEMP_MEDIA_ROOT).save(
+            'posts/image.jpg', ContentFile(CONTENT))
+        cls.url = settings.MEDIA_URL + cls.name
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_serves_file_with_cache_headers(self):
+        """Файл отдаётся целиком с ETag и бессрочным кэшем"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        """Запросы с Range получают 206 и нужный кусок файла"""
+        cases = (
+            ('bytes=0-9', CONTENT[:10], 'bytes 0-9/1024'),
+            ('bytes=1000-', CONTENT[1000:], 'bytes 1000-1023/1024'),
+            ('bytes=-4', CONTENT[-4:], 'bytes 1020-1023/1024'),
+        )
+        for header, body, content_range in cases:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(int(response['Content-Length']), len(body))
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+    @override_settings(MEDIA_ACCEL='nginx')
+    def test_x_accel_redirect(self):
+        """С nginx файл отдаёт фронтенд по X-Accel-Redirect"""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/' + self.name)
+        self.assertEqual(response.content, b'')
+
+    def test_path_traversal(self):
+        """Файлы вне MEDIA_ROOT не отдаются"""
+        response = self.client.get(settings.MEDIA_URL + '../manage.py')
+        self.assertEqual(response.status_code, 404)
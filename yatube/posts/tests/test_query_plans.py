@@ -0,0 +1,101 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from core.paginator import CursorPaginator
+
+from .. import tags, timeline
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTest(TestCase):
+    """Главные запросы лент не должны сканировать таблицы и сортировать."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        cls.post = Post.objects.create(
+            text='text', author=cls.author, group=cls.group)
+        cls.cursor = [timezone.now(), cls.post.pk]
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexed(self, queryset):
+        plan = self.explain(queryset)
+        for step in plan:
+            self.assertNotIn('TEMP B-TREE', step, plan)
+            self.assertIsNone(FULL_SCAN.match(step), plan)
+
+    def assertFeedIndexed(self, source, **kwargs):
+        paginator = CursorPaginator(source, 10, **kwargs)
+        for values in (None, self.cursor):
+            for after in (True, False):
+                with self.subTest(values=values, after=after):
+                    self.assertIndexed(
+                        paginator.window(source, values, after))
+
+    def test_index(self):
+        self.assertFeedIndexed(Post.objects.for_feed())
+
+    def test_group_posts(self):
+        self.assertFeedIndexed(self.group.group.for_feed())
+
+    def test_profile(self):
+        self.assertFeedIndexed(
+            Post.objects.filter(author=self.author).for_feed())
+
+    def test_follow_index(self):
+        # Два популярных автора: IN с одним значением SQLite планирует
+        # как равенство и сортировку бы не показал.
+        other = User.objects.create_user(username='other')
+        for author in (self.author, other):
+            Follow.objects.create(user=self.user, author=author)
+        UserStats.objects.filter(
+            user__in=(self.author, other)).update(pull_timeline=True)
+        sources = timeline.follow_feed(self.user)
+        self.assertEqual(len(sources), 3)
+        for source in sources:
+            self.assertFeedIndexed(
+                source,
+                ordering=timeline.TIMELINE_ORDERING,
+                key=timeline.TIMELINE_KEY,
+            )
+        self.assertIndexed(Follow.objects.filter(
+            user=self.user, author__stats__pull_timeline=True
+        ).values_list('author_id', flat=True))
+
+    def test_tag_feed(self):
+        self.assertFeedIndexed(
+            tags.tag_feed('tag'),
+            ordering=tags.FEED_ORDERING, key=tags.FEED_KEY)
+
+    def test_mentions_feed(self):
+        self.assertFeedIndexed(
+            tags.mentions_feed(self.user),
+            ordering=tags.FEED_ORDERING, key=tags.FEED_KEY)
+
+    def test_post_comments(self):
+        self.assertFeedIndexed(
+            Comment.objects.filter(post=self.post),
+            ordering=('created', 'id'),
+        )
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.url = reverse('posts:search')
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_posts_and_comments_are_ranked(self):
+        """Совпадение в тексте поста выше совпадения в комментарии"""
+        in_comment = Post.objects.create(text='Про погоду', author=self.author)
+        Comment.objects.create(
+            post=in_comment, author=self.author, text='Ежики в тумане')
+        in_text = Post.objects.create(
+            text='Ежики уходят на зимовку', author=self.author)
+        Post.objects.create(text='Про котов', author=self.author)
+        page = self.search('ежики')
+        self.assertEqual(
+            [post.id for post in page], [in_text.id, in_comment.id])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.create(text='старый текст', author=self.author)
+        post.text = 'новый текст'
+        post.save()
+        self.assertEqual(len(self.search('старый')), 0)
+        self.assertEqual([card.id for card in self.search('новый')], [post.id])
+        post.delete()
+        self.assertEqual(len(self.search('новый')), 0)
+
+    def test_cursor_pagination(self):
+        """Страницы выдачи идут по курсору без повторов и пропусков"""
+        posts = [
+            Post.objects.create(
+                text='слон ' * (number + 1), author=self.author)
+            for number in range(13)
+        ]
+        page = self.search('слон')
+        self.assertEqual(len(page), 10)
+        self.assertIsNotNone(page.next_cursor)
+        second = self.search('слон', cursor=page.next_cursor)
+        self.assertIsNone(second.next_cursor)
+        found = [card.id for card in page] + [card.id for card in second]
+        self.assertCountEqual(found, [post.id for post in posts])
+        previous = self.search('слон', cursor=second.previous_cursor)
+        self.assertEqual([card.id for card in previous], found[:10])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе не ломают поиск"""
+        Post.objects.create(text='near or not', author=self.author)
+        self.assertEqual(len(self.search('NEAR( "or* ^not')), 1)
+        self.assertIsNone(self.search('!!!'))
+
+    def test_ensure_index_restores_triggers(self):
+        """После потери триггеров индекс пересоздаётся и переиндексируется"""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_ai')
+        post = Post.objects.create(text='пропущенный пост', author=self.author)
+        self.assertEqual(len(self.search('пропущенный')), 0)
+        self.assertTrue(search.ensure_index())
+        self.assertFalse(search.ensure_index())
+        self.assertEqual(
+            [card.id for card in self.search('пропущенный')], [post.id])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        post = Post.objects.create(text='админский пост', author=self.author)
+        Post.objects.create(text='другой пост', author=self.author)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'админский'})
+        self.assertEqual(
+            [item.pk for item in response.context['cl'].result_list],
+            [post.pk])
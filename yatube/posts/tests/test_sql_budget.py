@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import QueryBudgetExceeded, QueryStats
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_WORKERS=0, SQL_BUDGET_RAISE=True)
+class SQLBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(12):
+            cls.post = Post.objects.create(
+                text=f'text {i} #tag @reader',
+                author=cls.author, group=cls.group)
+        for i in range(5):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'comment {i}')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_views_fit_budgets(self):
+        """Проверяем, что страницы укладываются в бюджет SQL-запросов"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=text',
+            reverse('posts:tag_list', kwargs={'tag': 'tag'}),
+            reverse('posts:mentions', kwargs={'username': 'reader'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('sql;dur=', response['Server-Timing'])
+
+    def test_feed_page_is_one_query(self):
+        """Проверяем, что страница ленты из карточек стоит один запрос
+
+        Второй запрос — свежайший пост для ETag.
+        """
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = Client().get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    @override_settings(SQL_BUDGETS={'posts:index': 1})
+    def test_budget_exceeded(self):
+        """Проверяем, что превышение бюджета ловится в тестах"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+    def test_n_plus_one_counts_distinct_params(self):
+        """N+1 — разные параметры одного запроса, а не точные повторы"""
+        stats = QueryStats()
+        sql = 'SELECT * FROM posts_post WHERE id = %s'
+        for params in ((1,), (1,), (1,), (2,)):
+            stats(lambda *args: None, sql, params, False, {})
+        self.assertEqual(stats.duplicates, 2)
+        self.assertEqual(stats.n_plus_one(3), {})
+        stats(lambda *args: None, sql, (3,), False, {})
+        self.assertEqual(
+            [item['count'] for item in stats.n_plus_one(3).values()], [3])
@@ -0,0 +1,62 @@
+import gzip
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSS = 'css/bootstrap.min.css'
+
+
+@override_settings(STATIC_ROOT=TEMP_STATIC_ROOT)
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def test_pages_link_hashed_names(self):
+        """Страницы ссылаются на статику с хешем в имени"""
+        hashed = staticfiles_storage.stored_name(CSS)
+        self.assertNotEqual(hashed, CSS)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, settings.STATIC_URL + hashed)
+
+    def test_serves_precompressed_copy(self):
+        """Клиенту с gzip отдаётся заранее сжатая копия и вечный кэш"""
+        url = settings.STATIC_URL + staticfiles_storage.stored_name(CSS)
+        with staticfiles_storage.open(CSS) as original:
+            content = original.read()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('immutable', response['Cache-Control'])
+        body = b''.join(response.streaming_content)
+        self.assertLess(len(body), len(content))
+        self.assertEqual(gzip.decompress(body), content)
+
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), content)
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unhashed_names_are_cached_briefly(self):
+        """Имена без хеша кэшируются на STATIC_MAX_AGE, а не навсегда"""
+        response = self.client.get(settings.STATIC_URL + CSS)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Cache-Control'],
+            f'public, max-age={settings.STATIC_MAX_AGE}')
@@ -0,0 +1,187 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.models import MediaBlob
+from core.storage import HashedFileSystemStorage
+
+from ..images import generate_post_thumbnails
+from ..management.commands import reclaim_media
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class HashedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Кэш общий для всех тестов: в нём могут остаться записи sorl
+        # о файлах с тем же содержимым.
+        cache.clear()
+        self.storage = HashedFileSystemStorage()
+
+    def test_identical_files_are_stored_once(self):
+        """Одинаковое содержимое хранится одним файлом со счётчиком"""
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.GIF', ContentFile(b'same'))
+        self.assertEqual(first, second)
+        self.assertTrue(self.storage.is_hashed(first))
+        self.assertTrue(first.startswith('posts/'))
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 2)
+
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(MediaBlob.objects.filter(name=first).exists())
+
+    def test_resaving_hashed_name_keeps_two_shard_levels(self):
+        """Пересохранение хешированного имени не вкладывает шарды"""
+        first = self.storage.save('posts/a.gif', ContentFile(b'first'))
+        second = self.storage.save(first, ContentFile(b'second'))
+        self.assertEqual(second.count('/'), first.count('/'))
+        self.assertTrue(second.startswith('posts/'))
+        self.assertEqual(
+            self.storage.save(second, ContentFile(b'first')), first)
+        variant = self.storage.save(
+            'variants/' + first[:-4] + '-320w.webp', ContentFile(b'webp'))
+        self.assertRegex(variant, r'^variants/posts/\w\w/\w\w/\w{64}\.webp$')
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_post_changes_release_references(self):
+        """Замена картинки и удаление поста снимают ссылки на файлы"""
+        user = User.objects.create_user(username='author')
+        posts = [
+            Post.objects.create(
+                author=user, text='Пост',
+                image=SimpleUploadedFile('same.gif', SMALL_GIF))
+            for _ in range(2)
+        ]
+        image = posts[0].image.name
+        self.assertEqual(MediaBlob.objects.get(name=image).refcount, 2)
+
+        posts[0].image = SimpleUploadedFile('red.gif', red_gif())
+        posts[0].save()
+        self.assertEqual(MediaBlob.objects.get(name=image).refcount, 1)
+        self.assertEqual(
+            MediaBlob.objects.get(name=posts[0].image.name).refcount, 1)
+
+        posts[1].delete()
+        self.assertFalse(MediaBlob.objects.filter(name=image).exists())
+        self.assertFalse(self.storage.exists(image))
+        self.assertTrue(self.storage.exists(posts[0].image.name))
+
+    def test_hash_media_moves_flat_files(self):
+        """Команда переносит старые файлы и объединяет дубликаты"""
+        flat = FileSystemStorage()
+        user = User.objects.create_user(username='author')
+        names = [
+            flat.save(f'posts/old_{i}.gif', ContentFile(b'old image'))
+            for i in range(2)
+        ]
+        for name in names + names[:1]:
+            Post.objects.create(author=user, text='Старый', image=name)
+
+        call_command('hash_media', workers=2, stdout=StringIO())
+
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        image = images.pop()
+        self.assertTrue(self.storage.is_hashed(image))
+        self.assertTrue(self.storage.exists(image))
+        self.assertEqual(MediaBlob.objects.get(name=image).refcount, 3)
+        for name in names:
+            self.assertFalse(
+                os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name)))
+
+    def test_reclaim_media_deletes_only_orphans(self):
+        """Команда удаляет файлы без ссылок и их миниатюры"""
+        user = User.objects.create_user(username='author')
+        kept = Post.objects.create(
+            author=user, text='Оставить',
+            image=SimpleUploadedFile('kept.gif', SMALL_GIF))
+        replaced = Post.objects.create(
+            author=user, text='Заменить',
+            image=SimpleUploadedFile('old.gif', red_gif()))
+        generate_post_thumbnails(kept.pk)
+        generate_post_thumbnails(replaced.pk)
+        before = walk_media()
+        replaced.refresh_from_db()
+        old_image = replaced.image.name
+        Post.objects.filter(pk=replaced.pk).update(
+            image=kept.image.name, image_variants='')
+
+        call_command(
+            'reclaim_media', delete=True, min_age=0, rate=0,
+            stdout=StringIO())
+
+        after = walk_media()
+        self.assertNotIn(old_image, after)
+        self.assertIn(kept.image.name, after)
+        removed = before - after
+        # Оригинал, варианты для srcset и миниатюра sorl.
+        self.assertTrue(any(name.startswith('variants/') for name in removed))
+        self.assertTrue(any(name.startswith('cache/') for name in removed))
+        self.assertTrue(any(name.startswith('cache/') for name in after))
+        self.assertFalse(MediaBlob.objects.filter(name=old_image).exists())
+
+    def test_reclaim_media_keeps_reused_orphans(self):
+        """Файл, загруженный заново после обхода, не удаляется"""
+        name = self.storage.save('posts/a.gif', ContentFile(b'orphan'))
+        path = self.storage.path(name)
+        os.utime(path, (0, 0))
+        refcounts = {name: 1}
+        cutoff = time.time() - 60
+
+        self.assertEqual(
+            self.storage.save('posts/b.gif', ContentFile(b'orphan')), name)
+        self.assertGreater(os.stat(path).st_mtime, cutoff)
+        command = reclaim_media.Command(stdout=StringIO())
+        options = {'rate': 0, 'batch_size': 10}
+        command.delete([(name, 6)], {}, refcounts, cutoff, options)
+        self.assertTrue(self.storage.exists(name))
+
+        # Ни ссылок, ни свежего mtime: теперь файл — сирота.
+        os.utime(path, (0, 0))
+        command.delete([(name, 6)], {}, {name: 2}, cutoff, options)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+
+def red_gif():
+    buffer = BytesIO()
+    Image.new('RGB', (4, 2), 'red').save(buffer, format='GIF')
+    return buffer.getvalue()
+
+
+def walk_media():
+    return {
+        os.path.relpath(os.path.join(path, name), TEMP_MEDIA_ROOT)
+        for path, _, files in os.walk(TEMP_MEDIA_ROOT) for name in files
+    }
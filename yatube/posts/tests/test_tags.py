@@ -0,0 +1,95 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import tags
+from ..models import Mention, Post, PostTag
+from ..tags import extract_mentions, extract_tags, index_post
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_WORKERS=0, SQL_BUDGET_RAISE=True)
+class TagsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_extract(self):
+        """Теги приводятся к нижнему регистру, упоминания — без точки"""
+        text = 'Про #Django и #джанго, не#тег, &#39; — спасибо @reader.'
+        self.assertEqual(extract_tags(text), {'django', 'джанго'})
+        self.assertEqual(extract_mentions(text), {'reader'})
+
+    def test_index_follows_text(self):
+        """Теги и упоминания пересобираются при правке текста"""
+        post = Post.objects.create(
+            text='#one #two @reader @nobody', author=self.author)
+        self.assertCountEqual(
+            post.tags.values_list('tag', flat=True), ['one', 'two'])
+        self.assertEqual(
+            list(post.mentions.values_list('user', flat=True)),
+            [self.reader.pk])
+        post.text = '#two #three'
+        post.save()
+        self.assertCountEqual(
+            post.tags.values_list('tag', flat=True), ['two', 'three'])
+        self.assertFalse(post.mentions.exists())
+        self.assertEqual(
+            post.tags.first().pub_date, post.pub_date)
+
+    def test_stale_rows_deleted_in_batches(self):
+        """Устаревшие теги удаляются пачками по DELETE_BATCH строк"""
+        post = Post.objects.create(
+            text='#one #two #three #four #five', author=self.author)
+        post.text = 'без тегов'
+        with mock.patch.object(tags, 'DELETE_BATCH', 2):
+            with CaptureQueriesContext(connection) as queries:
+                index_post(post)
+        deletes = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(post.tags.exists())
+
+    def test_feeds(self):
+        """Ленты по тегу и по упоминаниям — карточки по убыванию даты"""
+        posts = [
+            Post.objects.create(
+                text=f'#Тег {number} @reader', author=self.author)
+            for number in range(12)
+        ]
+        Post.objects.create(text='без тега', author=self.author)
+        expected = [post.pk for post in reversed(posts)]
+        for url in (
+            reverse('posts:tag_list', kwargs={'tag': 'тег'}),
+            reverse('posts:mentions', kwargs={'username': 'reader'}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                page_obj = response.context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in page_obj], expected[:10])
+                response = self.client.get(
+                    url, {'cursor': page_obj.next_cursor})
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    expected[10:])
+
+    def test_backfill(self):
+        """Команда заполняет теги постов, сохранённых мимо сигналов"""
+        post = Post.objects.create(text='#старый @reader', author=self.author)
+        PostTag.objects.all().delete()
+        Mention.objects.all().delete()
+        call_command('backfill_tags', '--chunk-size=1', stdout=StringIO())
+        self.assertEqual(
+            list(post.tags.values_list('tag', flat=True)), ['старый'])
+        self.assertTrue(post.mentions.filter(user=self.reader).exists())
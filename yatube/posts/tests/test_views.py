@@ -5,11 +5,15 @@ import time
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..images import PageThumbnails, generate_post_thumbnails
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      UserStats)
+from .utils import run_on_commit
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -152,6 +156,43 @@ class PostViewsTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(value, expected)
 
+    def test_cursor_pagination(self):
+        """Проверяем переход по курсорам вперёд и назад"""
+        url = reverse('posts:group_list', kwargs={'slug': 'slug'})
+        first_page = self.guest_client.get(url).context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertTrue(first_page.has_next())
+        self.assertIsNone(first_page.paginator.count)
+        self.assertEqual(first_page.start_index(), 1)
+
+        second_page = self.guest_client.get(
+            url, {'cursor': first_page.next_cursor}).context['page_obj']
+        self.assertEqual(len(second_page), 14 - max_posts)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertTrue(second_page.has_previous())
+        self.assertFalse(
+            set(post.pk for post in first_page)
+            & set(post.pk for post in second_page)
+        )
+
+        back_page = self.guest_client.get(
+            url, {'cursor': second_page.previous_cursor}).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in back_page],
+            [post.pk for post in first_page]
+        )
+
+        broken_page = self.guest_client.get(
+            url, {'cursor': 'не-курсор'}).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in broken_page],
+            [post.pk for post in first_page]
+        )
+        # Фрагмент кэшируется по границам страницы, а не по курсору.
+        self.assertEqual(broken_page.cache_key, first_page.cache_key)
+        self.assertEqual(back_page.cache_key, first_page.cache_key)
+        self.assertNotEqual(second_page.cache_key, first_page.cache_key)
+
     def test_correct_post_create(self):
         """Проверяем context для post_create"""
         response = self.authorized_client.get(reverse('posts:post_create'))
@@ -204,3 +245,178 @@ class PostViewsTest(TestCase):
         first_follow = Follow.objects.filter(
             user=self.user, author=self.user_two).count()
         self.assertEqual(first_follow, follow_count)
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_follow_index_timeline(self):
+        """Проверяем ленту подписок на материализованном инбоксе"""
+        follower = Client()
+        follower.force_login(self.user_two)
+        follower.get(
+            reverse('posts:profile_follow', kwargs={'username': self.user}))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user_two).count(), 14)
+
+        new_post = Post.objects.create(author=self.user, text='Свежий пост')
+        response = follower.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), max_posts)
+        self.assertEqual(page_obj[0].pk, new_post.pk)
+
+        stranger = Client()
+        stranger.force_login(self.user_tree)
+        response = stranger.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+        follower.get(
+            reverse('posts:profile_unfollow', kwargs={'username': self.user}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_two).exists())
+
+    @override_settings(BACKGROUND_WORKERS=0, TIMELINE_PULL_THRESHOLD=2)
+    def test_follow_index_hybrid_timeline(self):
+        """Проверяем подмешивание популярных авторов при чтении ленты"""
+        for username in ('test_two', 'test_tree'):
+            client = Client()
+            client.force_login(User.objects.get(username=username))
+            client.get(reverse(
+                'posts:profile_follow', kwargs={'username': self.user}))
+        self.assertTrue(UserStats.objects.get(user=self.user).pull_timeline)
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.user).exists())
+
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.user_tree}))
+        pushed_post = Post.objects.create(author=self.user_tree, text='Пуш')
+        pulled_post = Post.objects.create(author=self.user, text='Пул')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=pulled_post).exists())
+
+        follower = Client()
+        follower.force_login(self.user_tree)
+        response = follower.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0].pk, pulled_post.pk)
+
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [pushed_post.pk]
+        )
+
+        follower.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user}))
+        self.assertFalse(UserStats.objects.get(user=self.user).pull_timeline)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.user_two, post=pulled_post).exists())
+
+    def test_post_comments_pages(self):
+        """Проверяем постраничные комментарии только текущего поста"""
+        post = Post.objects.get(pk=1)
+        Comment.objects.create(
+            post=self.post, author=self.user_two, text='Чужой комментарий')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.user_two, text=f'Комментарий {i}')
+            for i in range(25)
+        )
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertTrue(
+            all(comment.post_id == post.pk for comment in comments))
+        self.assertIsNotNone(comments.next_cursor)
+
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': post.pk}),
+            {'cursor': comments.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertIsNone(response.context['comments'].next_cursor)
+        self.assertContains(response, 'Комментарий 24')
+        self.assertNotContains(response, 'Чужой комментарий')
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_conditional_get(self):
+        """Проверяем ответ 304 на неизменившиеся ленты и страницы постов"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'test'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        etags = {}
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('Last-Modified'))
+                etags[url] = response['ETag']
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 304)
+
+        with run_on_commit():
+            Post.objects.create(
+                author=self.user, text='Новый', group=self.group)
+            Comment.objects.create(
+                post=self.post, author=self.user_two,
+                text='Новый комментарий')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                etags[url] = response['ETag']
+
+        # Правка старого поста не меняет дату свежайшего, но ETag — да.
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        with run_on_commit():
+            post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_follow_changes_follower_profile(self):
+        """Проверяем, что подписка и отписка меняют ETag профиля подписчика"""
+        url = reverse('posts:profile', kwargs={'username': 'test'})
+        etag = self.guest_client.get(url)['ETag']
+        with run_on_commit():
+            follow = Follow.objects.create(
+                user=self.user, author=self.user_two)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with run_on_commit():
+            follow.delete()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_page_thumbnails_are_batched(self):
+        """Проверяем, что миниатюры страницы ищутся одним запросом"""
+        cache.clear()
+        posts = []
+        for i in range(3):
+            image = SimpleUploadedFile(
+                f'batch_{i}.gif', self.image.open().read(),
+                content_type='image/gif')
+            post = Post.objects.create(
+                author=self.user, text=f'С картинкой {i}', image=image)
+            generate_post_thumbnails(post.pk)
+            posts.append(post)
+        posts.append(Post.objects.create(author=self.user, text='Без'))
+
+        with self.assertNumQueries(0):
+            thumbnails = PageThumbnails(posts)
+            for post in posts[:3]:
+                self.assertIsNotNone(thumbnails.get(post))
+            self.assertIsNone(thumbnails.get(posts[3]))
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails = PageThumbnails(posts)
+            for post in posts[:3]:
+                self.assertIsNotNone(thumbnails.get(post))
@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def run_on_commit():
+    """Выполняет колбэки transaction.on_commit, отложенные внутри блока.
+
+    TestCase не коммитит транзакцию, и сами они не выполнились бы
+    (в Django 3.2 для этого есть captureOnCommitCallbacks).
+    """
+    start = len(connection.run_on_commit)
+    yield
+    while len(connection.run_on_commit) > start:
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
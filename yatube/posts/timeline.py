@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.db.models import F
+
+from core.tasks import run_in_background
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+TIMELINE_ORDERING = ('-timeline_date', '-timeline_post')
+TIMELINE_KEY = ('pub_date', 'id')
+
+
+def fan_out_post(post_id):
+    """Раскладывает пост по лентам подписчиков автора пачками.
+
+    Посты популярных авторов не раскладываются: их забирают при чтении.
+    """
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'pub_date', 'author__stats__pull_timeline').first()
+    if post is None or post['author__stats__pull_timeline']:
+        return
+    batch_size = settings.TIMELINE_FANOUT_BATCH
+    followers = Follow.objects.filter(
+        author_id=post['author_id']
+    ).values_list('user_id', flat=True).order_by('user_id')
+    last_user_id = 0
+    while True:
+        batch = list(followers.filter(user_id__gt=last_user_id)[:batch_size])
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=post['author_id'],
+                    pub_date=post['pub_date'],
+                )
+                for user_id in batch
+            ],
+            ignore_conflicts=True,
+        )
+        last_user_id = batch[-1]
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту свежие посты автора после подписки."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id):
+    """Заполняет ленты всех подписчиков автора, вернувшегося к раскладке."""
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def drop_author_entries(author_id):
+    """Убирает посты автора из всех инбоксов пачками.
+
+    Автор в режиме чтения подмешивается в ленты напрямую, а старые
+    записи в инбоксах только дублировали бы его посты.
+    """
+    batch_size = settings.TIMELINE_FANOUT_BATCH
+    entries = TimelineEntry.objects.filter(
+        author_id=author_id).values_list('pk', flat=True)
+    while True:
+        batch = list(entries[:batch_size])
+        if not batch:
+            break
+        TimelineEntry.objects.filter(pk__in=batch).delete()
+
+
+def update_mode(stats):
+    """Переключает автора между раскладкой при записи и чтением.
+
+    Порог с гистерезисом: автор уходит в режим чтения, набрав
+    TIMELINE_PULL_THRESHOLD подписчиков, и возвращается к раскладке,
+    только опустившись ниже доли TIMELINE_PUSH_RATIO от порога.
+    """
+    if stats is None:
+        return None
+    threshold = settings.TIMELINE_PULL_THRESHOLD
+    if not stats.pull_timeline and stats.followers_count >= threshold:
+        UserStats.objects.filter(pk=stats.pk).update(pull_timeline=True)
+        stats.pull_timeline = True
+        run_in_background(drop_author_entries, stats.pk)
+    elif (
+        stats.pull_timeline
+        and stats.followers_count < threshold * settings.TIMELINE_PUSH_RATIO
+    ):
+        UserStats.objects.filter(pk=stats.pk).update(pull_timeline=False)
+        stats.pull_timeline = False
+        run_in_background(backfill_followers, stats.pk)
+    return stats
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def follow_feed(user):
+    """Источники ленты подписок для CursorPaginator.
+
+    Инбокс пользователя читается одним проходом по его индексу, а посты
+    популярных авторов, на которых он подписан, подмешиваются из их
+    собственных лент.
+    """
+    sources = [
+        Post.objects.filter(timeline_entries__user=user).annotate(
+            timeline_date=F('timeline_entries__pub_date'),
+            timeline_post=F('timeline_entries__post'),
+        ).for_feed()
+    ]
+    pulled = list(Follow.objects.filter(
+        user=user, author__stats__pull_timeline=True
+    ).values_list('author_id', flat=True))
+    # По источнику на автора: каждый читается по своему индексу
+    # без общей сортировки, а слияние делает паджинатор. Один запрос
+    # с author_id IN (...) сортировал бы все посты этих авторов.
+    for author_id in pulled:
+        sources.append(
+            Post.objects.filter(author_id=author_id).annotate(
+                timeline_date=F('pub_date'),
+                timeline_post=F('id'),
+            ).for_feed()
+        )
+    return sources
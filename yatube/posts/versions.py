@@ -0,0 +1,52 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+GLOBAL = 'global'
+GROUP = 'group'
+AUTHOR = 'author'
+POST = 'post'
+
+
+def version_key(namespace, object_id=None):
+    return f'feed-version:{namespace}:{object_id or ""}'
+
+
+def _fresh_version():
+    # Не с единицы: если ключ версии вытеснят из кэша, новый номер
+    # не совпадёт со старыми фрагментами, которые ещё лежат в кэше.
+    return time.time_ns() // 1000
+
+
+def get_version(namespace, object_id=None):
+    key = version_key(namespace, object_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+
+
+def bump(namespace, object_id=None):
+    """Меняет версию, когда текущая транзакция закоммичена.
+
+    Сменись версия раньше, параллельный запрос успел бы прочитать ещё
+    старые данные и закэшировать их уже под новой версией.
+    """
+    key = version_key(namespace, object_id)
+    transaction.on_commit(lambda: _increment(key))
+
+
+def bump_post(author_id, group_id):
+    bump(GLOBAL)
+    bump(AUTHOR, author_id)
+    if group_id is not None:
+        bump(GROUP, group_id)
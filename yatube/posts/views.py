@@ -1,61 +1,74 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 
+from core.paginator import get_cursor_page
+
+from . import (
+    conditional, counters, search, tags, timeline, versions)
 from .forms import CommentForm, PostForm
+from .images import PageThumbnails, queue_thumbnails
 from .models import Comment, Follow, Group, Post, User
 
 max_posts = 10
+max_comments = 20
 
 
+@condition(etag_func=conditional.index_etag)
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_cursor_page(request, posts, max_posts)
     return render(request, template, {
         'title': title,
         'posts': posts,
         'page_obj': page_obj,
-        'page_number': page_number
+        'thumbnails': PageThumbnails(page_obj),
+        'feed_version': versions.get_version(versions.GLOBAL),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
     })
 
 
+@condition(etag_func=conditional.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group.all()[:max_posts]
+    posts = group.group.for_feed()
     template = 'posts/group_list.html'
     title = (f'Записи сообщества {group}')
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_cursor_page(request, posts, max_posts)
     return render(request, template, {
         'title': title,
         'group': group,
         'posts': posts,
-        'page_number': page_number,
         'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+        'feed_version': versions.get_version(versions.GROUP, group.pk),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
     })
 
 
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author)
+    posts = Post.objects.filter(author=author).for_feed()
     template_name = 'posts/profile.html'
-    postcount = posts.count
-    paginator = Paginator(posts, max_posts)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    stats = counters.user_stats(author)
+    page_obj = get_cursor_page(request, posts, max_posts)
     context = {
         'posts': posts,
         'username': username,
-        'pag_number': request.GET.get('page'),
         'page_obj': page_obj,
-        'postcount': postcount,
+        'thumbnails': PageThumbnails(page_obj),
+        'postcount': stats.posts_count,
+        'stats': stats,
         'author': author,
+        'feed_version': versions.get_version(versions.AUTHOR, author.pk),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
 
     if user.is_authenticated:
@@ -67,16 +80,63 @@ def profile(request, username):
     return render(request, template_name, context)
 
 
+def tag_posts(request, tag):
+    page_obj = get_cursor_page(
+        request, tags.tag_feed(tag), max_posts,
+        ordering=tags.FEED_ORDERING, key=tags.FEED_KEY)
+    return render(request, 'posts/tag_list.html', {
+        'title': f'Записи с тегом #{tag}',
+        'tag': tag,
+        'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+    })
+
+
+def mentions(request, username):
+    author = get_object_or_404(User, username=username)
+    page_obj = get_cursor_page(
+        request, tags.mentions_feed(author), max_posts,
+        ordering=tags.FEED_ORDERING, key=tags.FEED_KEY)
+    return render(request, 'posts/mentions.html', {
+        'title': f'Упоминания @{username}',
+        'author': author,
+        'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+    })
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search.search_page(
+        query, request.GET.get('cursor'), max_posts)
+    return render(request, 'posts/search.html', {
+        'title': f'Поиск: {query}' if query else 'Поиск',
+        'query': query,
+        'page_obj': page_obj,
+        'page_prefix': urlencode({'q': query}) + '&',
+        'thumbnails': PageThumbnails(page_obj or ()),
+    })
+
+
+def post_comments_page(request, post_id):
+    comments = Comment.objects.filter(
+        post_id=post_id).select_related('author')
+    return get_cursor_page(
+        request, comments, max_comments, ordering=('created', 'id'))
+
+
+@condition(etag_func=conditional.post_etag)
 def post_detail(request, post_id):
-    check_post = get_object_or_404(Post, pk=post_id)
+    check_post = get_object_or_404(
+        Post.objects.select_related('author', 'author__stats', 'group'),
+        pk=post_id)
     post = Post(check_post)
-    posts = Post.objects.filter(author=post.pk.author)
     template_name = 'posts/post_detail.html'
     title_list = post.pk.text
     title = title_list[:30]
-    postcount = posts.count
+    postcount = counters.user_stats(post.pk.author).posts_count
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.all()
+    comments = post_comments_page(request, post_id)
     if request.method == 'POST':
         return redirect('posts: add_comment')
     context = {
@@ -89,7 +149,16 @@ def post_detail(request, post_id):
     return render(request, template_name, context)
 
 
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('id'), pk=post_id)
+    return render(request, 'posts/includes/comments.html', {
+        'post_id': post_id,
+        'comments': post_comments_page(request, post_id),
+    })
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     title = 'Добавить запись'
     groups = Group.objects.all()
@@ -108,10 +177,12 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    queue_thumbnails(post)
     return redirect('posts:profile', username=request.user.username,)
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     title = 'Редактировать запись'
     groups = Group.objects.all()
@@ -134,11 +205,16 @@ def post_edit(request, post_id):
     }
     if not form.is_valid():
         return render(request, template_name, context)
+    if 'image' in form.changed_data:
+        post.image_variants = post.image_placeholder = ''
     form.save()
+    if 'image' in form.changed_data:
+        queue_thumbnails(post)
     return redirect('posts:post_detail', post.pk)
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -153,18 +229,20 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = timeline.follow_feed(request.user)
     template_name = 'posts/follow.html'
-    paginator = Paginator(posts, max_posts)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_cursor_page(
+        request, posts, max_posts,
+        ordering=timeline.TIMELINE_ORDERING, key=timeline.TIMELINE_KEY)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
     }
     return render(request, template_name, context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     if request.user != User.objects.get(username=username):
         Follow.objects.get_or_create(
@@ -175,6 +253,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     Follow.objects.get(
         user=request.user,
@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -46,11 +50,14 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -129,6 +136,12 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# collectstatic добавляет в имена хеш содержимого и пишет .gz-копии,
+# см. core.staticfiles и core.middleware.StaticFilesMiddleware.
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+# Файлы без хеша в имени (robots.txt и т. п.) кэшируются так.
+STATIC_MAX_AGE = 3600
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 LOGIN_URL = 'users:login'
@@ -137,8 +150,78 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Отдача медиа, см. core.media: None — FileResponse, 'nginx' —
+# X-Accel-Redirect на MEDIA_ACCEL_PREFIX, 'sendfile' — X-Sendfile.
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Файлы с хешем содержимого в имени кэшируются навсегда, прочие — так.
+MEDIA_MAX_AGE = 3600
+
+# Имена медиафайлов — хеш содержимого, см. core.storage. Миниатюры
+# sorl-thumbnail сами выбирают имя и должны лежать там, где их записали.
+DEFAULT_FILE_STORAGE = 'core.storage.HashedFileSystemStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Загрузки пишутся во временный файл с ранней проверкой лимитов,
+# см. core.uploads.
+FILE_UPLOAD_HANDLERS = ['core.uploads.LimitedImageUploadHandler']
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
+# Тесты вызывают cache.clear() и не должны стирать кэш сайта на том же
+# хосте, а записи прошлых прогонов (например, о миниатюрах) — влиять
+# на результат. Поэтому у каждого прогона свой временный файл.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    _test_cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+    atexit.register(shutil.rmtree, _test_cache_dir, ignore_errors=True)
+    CACHES['default']['LOCATION'] = os.path.join(
+        _test_cache_dir, 'cache.sqlite3')
+
+# Фоновые задачи: 0 — выполнять сразу в текущем потоке.
+BACKGROUND_WORKERS = 4
+# Процессы для обработки изображений: 0 — обрабатывать сразу.
+IMAGE_WORKERS = 2
+
+# Лента подписок (fan-out on write).
+TIMELINE_FANOUT_BATCH = 1000
+TIMELINE_BACKFILL = 200
+# Авторы с таким числом подписчиков не раскладываются при записи,
+# а подмешиваются в ленту при чтении.
+TIMELINE_PULL_THRESHOLD = 10000
+TIMELINE_PUSH_RATIO = 0.8
+
+# Бюджеты SQL-запросов по имени вьюхи, см. core.middleware.
+# В лентах +1 запрос: промахи миниатюр страницы добираются из
+# KVStore sorl-thumbnail одним запросом.
+SQL_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 7,
+    'posts:profile': 9,
+    'posts:post_detail': 7,
+    'posts:post_comments': 4,
+    'posts:follow_index': 7,
+    'posts:search': 5,
+    'posts:tag_list': 6,
+    'posts:mentions': 7,
+    'api:v1:posts': 3,
+    'api:v1:group_posts': 4,
+    'api:v1:author_posts': 4,
+    'api:v1:post_detail': 4,
+    'api:v1:post_comments': 5,
+}
+SQL_BUDGET_RAISE = False
+SQL_N_PLUS_ONE_THRESHOLD = 3
+
+# Фрагменты лент кэшируются надолго: ключ включает версию ленты,
+# которую сигналы меняют при каждом изменении постов, групп и авторов.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24